@@ -0,0 +1,75 @@
+# api_client.py
+import uuid
+import requests
+
+
+class RemoteCourseAssistant:
+    """Thin HTTP client with the same interface as UBCCourseAssistant"""
+
+    def __init__(self, base_url, timeout=20):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        # Conversation history is kept server-side under this id
+        self.session_id = uuid.uuid4().hex
+
+    def _get(self, path, **params):
+        response = self.session.get(f"{self.base_url}{path}", params=params, timeout=self.timeout)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    def ask(self, question, campus=None, year=None, session=None):
+        """Send a question to the API server"""
+        try:
+            response = self.session.post(
+                f"{self.base_url}/ask",
+                json={
+                    'question': question,
+                    'session_id': self.session_id,
+                    'campus': campus,
+                    'year': year,
+                    'session': session
+                },
+                timeout=self.timeout
+            )
+            if response.status_code == 503:
+                return {
+                    'answer': "The assistant is busy right now. Please try again in a moment.",
+                    'sources': []
+                }
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            print(f"Error contacting assistant API: {e}")
+            return {
+                'answer': "I couldn't reach the course assistant service. Please try again.",
+                'sources': []
+            }
+
+    def get_course(self, code):
+        return self._get(f"/course/{code}")
+
+    def get_department_courses(self, dept_code):
+        result = self._get(f"/department/{dept_code}")
+        return result['courses'] if result else []
+
+    def search(self, query, k=10):
+        result = self._get("/search", q=query, k=k)
+        return result['results'] if result else []
+
+    def suggest(self, prefix, limit=8):
+        result = self._get("/suggest", q=prefix, limit=limit)
+        return result['suggestions'] if result else []
+
+    def similar_courses(self, code, k=5, same_dept=False):
+        result = self._get(f"/similar/{code}", k=k, same_dept=same_dept)
+        return result['similar'] if result else []
+
+    def reset_conversation(self):
+        """Clear this client's conversation history on the server"""
+        try:
+            self.session.delete(f"{self.base_url}/session/{self.session_id}", timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            print(f"Error resetting conversation: {e}")
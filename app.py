@@ -1,5 +1,7 @@
+import os
 import streamlit as st
-from chatbot import UBCCourseAssistant
+from chatbot import SessionAssistant, UBCCourseAssistant
+from api_client import RemoteCourseAssistant
 
 # Page config
 st.set_page_config(
@@ -24,10 +26,69 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Messages rendered in full on every rerun; older ones are collapsed
+EXPANDED_MESSAGES = 10
+# Messages kept per session at all
+MAX_STORED_MESSAGES = 100
+# Characters of each source kept with a message
+SNIPPET_CHARS = 300
+
+
+def source_snippets(sources):
+    """(code, snippet) pairs for a result's sources, truncated for display.
+
+    Taken from the sources the answer was built from, so they match the
+    offering and index version that answered, not whatever is current later.
+    """
+    snippets = []
+    for source in sources:
+        # Handle both dict and Document objects
+        if isinstance(source, dict):
+            code, content = source.get('code'), source.get('content', '')
+        else:
+            code, content = source.metadata.get('course_code'), source.page_content
+        if code:
+            snippets.append((code, content[:SNIPPET_CHARS] + "..." if len(content) > SNIPPET_CHARS else content))
+    return snippets
+
+
+def render_message(message, collapsed=False):
+    """Render one chat message; collapsed messages show a short preview only"""
+    with st.chat_message(message["role"]):
+        if collapsed:
+            content = message["content"]
+            st.markdown(content[:200] + "..." if len(content) > 200 else content)
+            return
+
+        st.markdown(message["content"])
+
+        # Show sources if available
+        snippets = message.get("sources")
+        if snippets:
+            with st.expander(f"📚 View {len(snippets)} Sources"):
+                for i, (course_code, snippet) in enumerate(snippets, 1):
+                    st.markdown(f"**Source {i}: {course_code}**")
+                    st.text(snippet)
+                    if i < len(snippets):
+                        st.markdown("---")
+
+
+@st.cache_resource(show_spinner=False)
+def shared_assistant():
+    """One in-process assistant (model, index, batcher) for all browser sessions"""
+    return UBCCourseAssistant.from_env()
+
+
 # Initialize session state
 if 'assistant' not in st.session_state:
     with st.spinner("Loading UBC Course Assistant..."):
-        st.session_state.assistant = UBCCourseAssistant()
+        # Use the shared API server when configured, otherwise load in-process;
+        # either way each browser session keeps its own conversation
+        api_url = os.getenv("ASSISTANT_API_URL")
+        if api_url:
+            st.session_state.assistant = RemoteCourseAssistant(api_url)
+        else:
+            st.session_state.assistant = SessionAssistant(shared_assistant())
 
 if 'messages' not in st.session_state:
     st.session_state.messages = []
@@ -38,6 +99,22 @@ st.markdown("Ask me anything about UBC courses!")
 
 # Sidebar
 with st.sidebar:
+    st.header("Find a Course")
+    lookup = st.text_input("Course code or title", placeholder="e.g. cpsc 3 or intro to stat")
+    if lookup:
+        suggestions = st.session_state.assistant.suggest(lookup)
+        if not suggestions:
+            st.caption("No matching courses")
+        for suggestion in suggestions:
+            # Picking a suggestion asks about the exact code, skipping semantic search
+            if st.button(f"{suggestion['code']} — {suggestion['title']}", key=f"suggest_{suggestion['code']}"):
+                st.session_state.pending_question = f"What is {suggestion['code']} about?"
+
+    st.markdown("---")
+    campus_choice = st.selectbox("Campus", ["Any", "Vancouver (UBCV)", "Okanagan (UBCO)"])
+    campus = {"Vancouver (UBCV)": "UBCV", "Okanagan (UBCO)": "UBCO"}.get(campus_choice)
+
+    st.markdown("---")
     st.header("About")
     st.markdown("""
     This chatbot uses RAG (Retrieval-Augmented Generation) to answer questions about UBC courses.
@@ -68,63 +145,34 @@ with st.sidebar:
     st.markdown("- Be specific for detailed info")
     st.markdown("- Check sources for full descriptions")
 
-# Display chat history
-for message in st.session_state.messages:
-    with st.chat_message(message["role"]):
-        st.markdown(message["content"])
-
-        # Show sources if available
-        if "sources" in message and message["sources"]:
-            with st.expander(f"📚 View {len(message['sources'])} Sources"):
-                for i, source in enumerate(message["sources"], 1):
-                    # Handle both dict and Document objects
-                    if isinstance(source, dict):
-                        course_code = source.get('code', 'N/A')
-                        content = source.get('content', '')
-                    else:
-                        course_code = source.metadata.get('course_code', 'N/A')
-                        content = source.page_content
+# Display chat history: only the most recent messages are rendered in full
+earlier = st.session_state.messages[:-EXPANDED_MESSAGES]
+if earlier and st.checkbox(f"Show {len(earlier)} earlier messages"):
+    for message in earlier:
+        render_message(message, collapsed=True)
 
-                    st.markdown(f"**Source {i}: {course_code}**")
-                    st.text(content[:300] + "..." if len(content) > 300 else content)
-                    if i < len(message['sources']):
-                        st.markdown("---")
+for message in st.session_state.messages[-EXPANDED_MESSAGES:]:
+    render_message(message)
 
 # Chat input
-if prompt := st.chat_input("Ask about UBC courses..."):
+if prompt := (st.chat_input("Ask about UBC courses...") or st.session_state.pop('pending_question', None)):
     # Add user message
-    st.session_state.messages.append({"role": "user", "content": prompt})
-
-    with st.chat_message("user"):
-        st.markdown(prompt)
+    user_message = {"role": "user", "content": prompt}
+    st.session_state.messages.append(user_message)
+    render_message(user_message)
 
     # Get assistant response
-    with st.chat_message("assistant"):
-        with st.spinner("Searching courses..."):
-            result = st.session_state.assistant.ask(prompt)
-
-            st.markdown(result['answer'])
-
-            # Show sources
-            if result['sources']:
-                with st.expander(f"📚 View {len(result['sources'])} Sources"):
-                    for i, source in enumerate(result['sources'], 1):
-                        # Handle both dict and Document objects
-                        if isinstance(source, dict):
-                            course_code = source.get('code', 'N/A')
-                            content = source.get('content', '')
-                        else:
-                            course_code = source.metadata.get('course_code', 'N/A')
-                            content = source.page_content
-
-                        st.markdown(f"**Source {i}: {course_code}**")
-                        st.text(content[:300] + "..." if len(content) > 300 else content)
-                        if i < len(result['sources']):
-                            st.markdown("---")
-
-    # Add assistant message
-    st.session_state.messages.append({
+    with st.spinner("Searching courses..."):
+        result = st.session_state.assistant.ask(prompt, campus=campus)
+
+    # Keep short snippets of the sources, not their full text
+    assistant_message = {
         "role": "assistant",
         "content": result['answer'],
-        "sources": result['sources']
-    })
\ No newline at end of file
+        "sources": source_snippets(result['sources'])
+    }
+    st.session_state.messages.append(assistant_message)
+    render_message(assistant_message)
+
+    # Cap per-session history
+    del st.session_state.messages[:-MAX_STORED_MESSAGES]
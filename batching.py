@@ -0,0 +1,179 @@
+# batching.py
+"""Dynamic micro-batching of query embeddings across concurrent callers.
+
+Concurrent `ask` calls each need one query embedded and searched. Encoding
+them one at a time wastes most of a forward pass on per-call overhead, so
+callers enqueue their query text here and block; a single worker thread
+collects up to `max_batch` pending queries (waiting at most `max_wait_ms`
+after the first one arrives), encodes them in one batch, runs one
+multi-query search per collection and hands each caller its own results.
+"""
+import queue
+import threading
+import time
+from collections import deque
+
+# Queued by close() to tell the worker to exit
+_STOP = object()
+
+
+class _PendingQuery:
+    __slots__ = ('collection', 'text', 'k', 'enqueued', 'done', 'result', 'error')
+
+    def __init__(self, collection, text, k):
+        self.collection = collection
+        self.text = text
+        self.k = k
+        self.enqueued = time.monotonic()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class QueryBatcher:
+    """Collects concurrent queries and embeds/searches them in batches"""
+
+    def __init__(self, embed_fn, max_wait_ms=5.0, max_batch=32, history=1000):
+        self.embed_fn = embed_fn
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch = max_batch
+
+        self._queue = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = deque(maxlen=history)
+        self._queue_delays = deque(maxlen=history)
+        self._total_batches = 0
+        self._total_queries = 0
+
+        self._closed = False
+        self._close_lock = threading.Lock()
+        self._worker = threading.Thread(target=self._loop, name='query-batcher', daemon=True)
+        self._worker.start()
+
+    def search(self, collection, text, k):
+        """Embed `text` and query `collection` for its top `k` hits.
+
+        Returns a dict with 'documents', 'metadatas' and 'distances' lists
+        for this single query, in the same order Chroma returns them.
+        """
+        return self.search_many([collection], text, k)[0]
+
+    def search_many(self, collections, text, k):
+        """Like search(), over several collections; the text is embedded once per batch"""
+        items = [_PendingQuery(collection, text, k) for collection in collections]
+        with self._close_lock:
+            if self._closed:
+                raise RuntimeError("QueryBatcher is closed")
+            for item in items:
+                self._queue.put(item)
+        for item in items:
+            item.done.wait()
+            if item.error is not None:
+                raise item.error
+        return [item.result for item in items]
+
+    def _collect(self):
+        """Block for the first query, then gather more until full or timed out.
+
+        Returns None once close() has been called and the queue is drained.
+        """
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        deadline = first.enqueued + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    item = self._queue.get_nowait()
+                else:
+                    item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                # Finish this batch first; the next _collect() sees the stop
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            started = time.monotonic()
+            try:
+                self._run(batch)
+            except Exception as e:
+                for item in batch:
+                    item.error = e
+            finally:
+                self._record(batch, started)
+                for item in batch:
+                    item.done.set()
+
+    def close(self):
+        """Stop the worker thread after the queries already queued are answered"""
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        if threading.current_thread() is not self._worker:
+            self._worker.join()
+
+    def _run(self, batch):
+        # Identical texts in one batch (popular queries) are encoded once
+        unique_texts = list(dict.fromkeys(item.text for item in batch))
+        vectors = dict(zip(unique_texts, self.embed_fn(unique_texts)))
+
+        # One multi-query search per collection, at the largest k requested
+        by_collection = {}
+        for item in batch:
+            by_collection.setdefault(id(item.collection), []).append(item)
+
+        for items in by_collection.values():
+            results = items[0].collection.query(
+                query_embeddings=[vectors[item.text] for item in items],
+                n_results=max(item.k for item in items)
+            )
+            for i, item in enumerate(items):
+                item.result = {
+                    key: (results.get(key) or [[]] * len(items))[i][:item.k]
+                    for key in ('documents', 'metadatas', 'distances')
+                }
+
+    def _record(self, batch, started):
+        with self._stats_lock:
+            self._total_batches += 1
+            self._total_queries += len(batch)
+            self._batch_sizes.append(len(batch))
+            self._queue_delays.extend((started - item.enqueued) * 1000.0 for item in batch)
+
+    def stats(self):
+        """Batch-size and queue-delay metrics over the recent history"""
+        with self._stats_lock:
+            sizes = sorted(self._batch_sizes)
+            delays = sorted(self._queue_delays)
+            total_batches = self._total_batches
+            total_queries = self._total_queries
+
+        def percentile(values, p):
+            if not values:
+                return 0.0
+            return values[min(len(values) - 1, int(p / 100.0 * len(values)))]
+
+        return {
+            'max_wait_ms': self.max_wait * 1000.0,
+            'max_batch': self.max_batch,
+            'pending': self._queue.qsize(),
+            'total_batches': total_batches,
+            'total_queries': total_queries,
+            'mean_batch_size': sum(sizes) / len(sizes) if sizes else 0.0,
+            'max_batch_size': sizes[-1] if sizes else 0,
+            'queue_delay_ms_p50': percentile(delays, 50),
+            'queue_delay_ms_p95': percentile(delays, 95),
+            'queue_delay_ms_max': delays[-1] if delays else 0.0,
+        }
@@ -1,50 +1,292 @@
-import json
-import chromadb
+import functools
+import os
+import threading
+import weakref
 from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
 import re
+from batching import QueryBatcher
+from conversation_memory import ConversationWindow
+from course_store import CourseStore
+from rerank import DEFAULT_RERANK_MODEL, CrossEncoderReranker
+from validation import normalize_course_code
+import snapshots
+
+# A reference back to the course discussed last
+FOLLOW_UP_REFERENCE = re.compile(r'\b(it|its|this course|that course|this one|that one|the course)\b')
+# Words a follow-up may use besides the reference; anything else is a topic of its own
+FOLLOW_UP_WORDS = {
+    'what', "what's", 'whats', 'is', 'are', 'was', 'the', 'a', 'an', 'for', 'of', 'about', 'on',
+    'me', 'tell', 'more', 'show', 'give', 'does', 'do', 'have', 'has', 'any', 'there', 'which',
+    'when', 'how', 'many', 'much', 'can', 'i', 'take', 'to', 'in', 'and', 'before', 'need', 'please',
+    'again', 'explain', 'describe', 'details', 'info', 'information', 'description', 'level',
+    'prereq', 'prereqs', 'prerequisite', 'prerequisites', 'requirements', 'required',
+    'credit', 'credits', 'department', 'offered', 'cover', 'covers',
+}
+
+
+def _pinned(method):
+    """Run a public method against one index version, even if a swap happens meanwhile"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if getattr(self._local, 'store', None) is not None:
+            return method(self, *args, **kwargs)
+        # Held until the call returns, so a swapped-out store isn't closed under it
+        with self._store_lock:
+            store = self._store
+            store.acquire()
+        self._local.store = store
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._local.store = None
+            store.release()
+    return wrapper
+
+
+def _watch_snapshots(assistant_ref, stop, interval):
+    """Poll for new snapshots; holds only a weak reference, so the assistant can be collected"""
+    while not stop.wait(interval):
+        assistant = assistant_ref()
+        if assistant is None:
+            return
+        try:
+            assistant.reload()
+        except Exception as e:
+            print(f"Error loading new snapshot: {e}")
+        del assistant
 
 
 class UBCCourseAssistant:
-    def __init__(self, persist_directory='./chroma_db'):
-        """Initialize with ChromaDB"""
+    def __init__(self, persist_directory='./chroma_db', batch_max_wait_ms=5.0, batch_max_size=32,
+                 snapshot_root=snapshots.SNAPSHOT_ROOT, watch_interval=30.0, default_campus=None,
+                 embedding_function=None, embedding_model=snapshots.EMBEDDING_MODEL,
+                 rerank_model=DEFAULT_RERANK_MODEL, rerank_top_n=10, rerank_budget_ms=150.0, reranker=None):
+        """Initialize with ChromaDB.
+
+        Loads the published snapshot under `snapshot_root` when there is one
+        (and watches it for new versions), otherwise `persist_directory`.
+        Questions that don't name a campus are routed to `default_campus`,
+        or to every campus if it is None. `embedding_function` replaces the
+        sentence-transformers model (e.g. the offline stand-in in loadtest.py);
+        `embedding_model` is the name snapshots must be built with.
+
+        General questions are reranked with the `rerank_model` cross-encoder
+        (or a ready-made `reranker`); pass rerank_model=None to disable.
+        Only the top `rerank_top_n` hits are rescored, and only as many as fit
+        in `rerank_budget_ms` per question.
+        """
+        self.snapshot_root = snapshot_root
+        self.default_campus = default_campus
+        self.embedding_model = embedding_model
+        self._local = threading.local()
+        self._store_lock = threading.Lock()
         try:
-            self.client = chromadb.PersistentClient(path=persist_directory)
-            self.embedding_function = SentenceTransformerEmbeddingFunction(
-                model_name="paraphrase-MiniLM-L3-v2"
+            self.embedding_function = embedding_function or SentenceTransformerEmbeddingFunction(
+                model_name=embedding_model
             )
-            self.collection = self.client.get_collection(
-                name="courses",
-                embedding_function=self.embedding_function
+            version = snapshots.current_version(snapshot_root) if snapshot_root else None
+            if version:
+                self._store = CourseStore.from_snapshot(
+                    snapshots.snapshot_path(snapshot_root, version),
+                    self.embedding_function,
+                    default_campus=default_campus
+                )
+            else:
+                self._store = CourseStore.from_directory(
+                    persist_directory,
+                    self.embedding_function,
+                    default_campus=default_campus
+                )
+            # Concurrent semantic searches share one embedding forward pass
+            self.batcher = QueryBatcher(
+                self.embedding_function,
+                max_wait_ms=batch_max_wait_ms,
+                max_batch=batch_max_size
             )
-            print("✓ Vector store loaded successfully")
+            # Its worker thread doesn't reference us; stop it if we are collected unclosed
+            weakref.finalize(self, self.batcher.close)
+            print(f"✓ Vector store loaded successfully (version {self._store.version})")
+            print(f"Loaded {len(self._store.courses)} courses")
         except Exception as e:
             print(f"Error initializing vector store: {e}")
             raise
 
-        # Load courses for direct access
-        try:
-            with open('data/raw/ubc_courses.json', 'r', encoding='utf-8') as f:
-                self.courses = json.load(f)
-            print(f"Loaded {len(self.courses)} courses")
-        except Exception as e:
-            print(f"Warning: Could not load courses: {e}")
-            self.courses = []
-
-        # Index courses by department
-        self.dept_courses = {}
-        for course in self.courses:
-            dept = course['department']
-            if dept not in self.dept_courses:
-                self.dept_courses[dept] = []
-            self.dept_courses[dept].append(course)
+        # Second-stage reranker; retrieval works without it if it can't load
+        self.reranker = reranker
+        if self.reranker is None and rerank_model:
+            try:
+                self.reranker = CrossEncoderReranker(
+                    rerank_model,
+                    top_n=rerank_top_n,
+                    budget_ms=rerank_budget_ms,
+                    max_concurrency=os.cpu_count() or 1
+                )
+            except Exception as e:
+                print(f"Warning: Could not load reranker {rerank_model}: {e}")
+        self._inflight = 0
+        self._inflight_lock = threading.Lock()
+
+        # Bounded history, used to resolve follow-ups like "what are its prereqs?"
+        self.conversation = ConversationWindow()
+
+        # Pick up snapshots published by create_vectordb.py without a restart
+        self._stop_watching = threading.Event()
+        if version and watch_interval:
+            threading.Thread(
+                target=_watch_snapshots,
+                args=(weakref.ref(self), self._stop_watching, watch_interval),
+                name='snapshot-watcher',
+                daemon=True
+            ).start()
 
         print("✓ Chatbot initialized successfully!")
 
+    # The index a request sees: the version pinned at its start, else the live one
+    def _current_store(self):
+        return getattr(self._local, 'store', None) or self._store
+
+    @property
+    def version(self):
+        return self._current_store().version
+
+    @property
+    def courses(self):
+        return self._current_store().courses
+
+    @property
+    def typeahead(self):
+        return self._current_store().typeahead
+
+    @property
+    def similarity(self):
+        return self._current_store().similarity
+
+    # The partitions a request searches: routed at the start of ask(), else the defaults
+    def _partitions(self):
+        return getattr(self._local, 'partitions', None) or self._current_store().router.route()
+
+    def reload(self):
+        """Load the published snapshot if it is newer and swap it in atomically.
+
+        Requests already in flight finish on the version they started with.
+        Returns True if a new version was swapped in.
+        """
+        version = snapshots.current_version(self.snapshot_root) if self.snapshot_root else None
+        if not version or version == self._store.version:
+            return False
+
+        path = snapshots.snapshot_path(self.snapshot_root, version)
+        model = snapshots.read_manifest(path).get('embedding_model')
+        if model != self.embedding_model:
+            print(f"Snapshot {version} uses embedding model {model}; restart required")
+            return False
+
+        store = CourseStore.from_snapshot(path, self.embedding_function, default_campus=self.default_campus)
+        with self._store_lock:
+            previous, self._store = self._store, store
+        # Closes the old version's Chroma system once its in-flight requests finish
+        previous.retire()
+        print(f"✓ Switched to index snapshot {version}")
+        return True
+
+    def stop_watching(self):
+        self._stop_watching.set()
+
+    def close(self):
+        """Stop the snapshot watcher and the batcher, and release the loaded index"""
+        self._stop_watching.set()
+        self.batcher.close()
+        with self._store_lock:
+            store = self._store
+        store.retire()
+
+    @classmethod
+    def from_env(cls):
+        """Assistant configured from the environment (see .env.example)"""
+        return cls(
+            os.getenv("PERSIST_DIRECTORY", "./chroma_db"),
+            batch_max_wait_ms=float(os.getenv("BATCH_MAX_WAIT_MS", "5")),
+            batch_max_size=int(os.getenv("BATCH_MAX_SIZE", "32")),
+            snapshot_root=os.getenv("SNAPSHOT_ROOT", snapshots.SNAPSHOT_ROOT),
+            watch_interval=float(os.getenv("SNAPSHOT_WATCH_INTERVAL", "30")),
+            default_campus=os.getenv("DEFAULT_CAMPUS") or None,
+            rerank_model=os.getenv("RERANK_MODEL", DEFAULT_RERANK_MODEL) or None,
+            rerank_top_n=int(os.getenv("RERANK_TOP_N", "10")),
+            rerank_budget_ms=float(os.getenv("RERANK_BUDGET_MS", "150")),
+        )
+
+    @staticmethod
+    def _normalize_code(code):
+        """Normalize 'cpsc110' / 'CPSC-110' / 'CPSC  110' to 'CPSC 110'"""
+        return normalize_course_code(code)
+
+    def _course_to_source(self, course):
+        """Convert a raw catalog record to the source dict used in answers"""
+        return {
+            'code': course['course_code'],
+            'department': course['department'],
+            'content': (
+                f"{course['course_code']} - {course['department']} Course\n"
+                f"Description: {course['description']}\n"
+                f"Prerequisites: {course.get('prerequisites', '')}\n"
+                f"Department: {course['department']}"
+            )
+        }
+
+    @_pinned
+    def get_course(self, code):
+        """Exact lookup of a single course by code, or None"""
+        course = self._current_store().lookup(self._normalize_code(code), self._partitions())
+        return self._course_to_source(course) if course else None
+
+    @_pinned
+    def get_department_courses(self, dept_code):
+        """All courses of a department, sorted by course code"""
+        courses = self._current_store().department(dept_code.upper(), self._partitions())
+        return [self._course_to_source(c) for c in sorted(courses, key=lambda x: x['course_code'])]
+
+    @_pinned
+    def search(self, query, k=10):
+        """Public semantic search over the course collection"""
+        return self._search_by_semantic(query, k=k)
+
+    @_pinned
+    def suggest(self, prefix, limit=8):
+        """Typeahead: courses whose code or title starts with `prefix`"""
+        return self.typeahead.suggest(prefix, limit)
+
+    @_pinned
+    def similar_courses(self, code, k=5, same_dept=False):
+        """Courses most similar to `code`, answered from the precomputed table"""
+        if self.similarity is None:
+            return []
+        code = self._normalize_code(code)
+        partitions = self._partitions()
+        by_key = {partition.key: partition for partition in partitions}
+        for partition in partitions:
+            record_id = partition.record_id(code)
+            if record_id in self.similarity.row_of:
+                break
+        else:
+            return []
+
+        # Rows span all partitions; keep neighbours from the routed ones, and
+        # skip other offerings of the same course
+        similar = {}
+        for other_id, score in self.similarity.similar(record_id, self.similarity.k, same_dept):
+            key, _, other = other_id.rpartition('/')
+            key = key or 'all'
+            if key in by_key and other != code and other not in similar:
+                similar[other] = {'code': other, 'department': other.split()[0], 'score': score}
+            if len(similar) == k:
+                break
+        return list(similar.values())
+
     def _get_all_courses_by_department(self, dept_code):
         """Get filtered courses for a department"""
         try:
-            if dept_code in self.dept_courses:
-                courses = self.dept_courses[dept_code]
+            courses = self._current_store().department(dept_code, self._partitions())
+            if courses:
                 filtered_courses = []
                 
                 # Group by level for better organization
@@ -136,23 +378,57 @@ class UBCCourseAssistant:
         question_lower = question.lower()
         return any(keyword in question_lower for keyword in listing_keywords)
 
-    def _search_by_semantic(self, question, k=10):
-        """Semantic search using ChromaDB"""
+    def _is_similarity_query(self, question):
+        """Check if user wants courses similar to a given one"""
+        return re.search(r'\b(similar|related to|alternatives? to|courses? like)\b', question.lower()) is not None
+
+    def _is_follow_up(self, question):
+        """Check if a short question only refers back to the previously discussed course.
+
+        "what are its prereqs?" is a follow-up; "is it possible to study
+        machine learning?" has a topic of its own and is searched instead.
+        """
+        text = question.lower()
+        if not FOLLOW_UP_REFERENCE.search(text):
+            return False
+        words = re.findall(r"[a-z']+", FOLLOW_UP_REFERENCE.sub(' ', text))
+        return len(words) <= 8 and all(word in FOLLOW_UP_WORDS for word in words)
+
+    def _search_by_semantic(self, question, k=10, rerank=False):
+        """Semantic search using ChromaDB, over the routed partitions only.
+
+        With `rerank`, over-fetches candidates and lets the cross-encoder
+        reorder the top few before cutting to `k`.
+        """
         try:
-            results = self.collection.query(
-                query_texts=[question],
-                n_results=k
-            )
-            
+            store = self._current_store()
+            collections = [store.collections[partition] for partition in self._partitions()]
+            rerank = rerank and self.reranker is not None
+            fetch_k = max(k, self.reranker.top_n) if rerank else k
+            results = self.batcher.search_many(collections, question, fetch_k)
+
+            # Fan-out across partitions: merge hits by distance, best offering of each code
+            hits = []
+            for result in results:
+                hits.extend(zip(result['distances'] or [0.0] * len(result['documents']),
+                                result['documents'], result['metadatas']))
+            hits.sort(key=lambda hit: hit[0])
+
             courses = []
-            if results and results['documents']:
-                for doc, metadata in zip(results['documents'][0], results['metadatas'][0]):
-                    courses.append({
-                        'code': metadata.get('course_code', 'Unknown'),
-                        'department': metadata.get('department', 'Unknown'),
-                        'content': doc
-                    })
-            return courses
+            seen = set()
+            for _, doc, metadata in hits:
+                code = metadata.get('course_code', 'Unknown')
+                if code in seen:
+                    continue
+                seen.add(code)
+                courses.append({
+                    'code': code,
+                    'department': metadata.get('department', 'Unknown'),
+                    'content': doc
+                })
+            if rerank:
+                courses = self.reranker.rerank(question, courses, inflight=self._inflight)
+            return courses[:k]
         except Exception as e:
             print(f"Error in semantic search: {e}")
             return []
@@ -215,6 +491,19 @@ class UBCCourseAssistant:
 
         return '\n'.join(sections)
 
+    def _format_similar_courses(self, code, matches):
+        """Nearest neighbours of a course, most similar first"""
+        sections = [f"# Courses similar to {code}\n"]
+        for rank, (course, score) in enumerate(matches, 1):
+            desc = ""
+            for line in course['content'].split('\n'):
+                if 'Description:' in line:
+                    desc = line.split('Description:', 1)[1].strip()
+            if len(desc) > 200:
+                desc = desc[:200] + "..."
+            sections.append(f"\n### {rank}. {course['code']} (similarity {score:.2f})\n{desc}\n\n---")
+        return '\n'.join(sections)
+
     def _format_single_course(self, course):
         """Enhanced course formatting"""
         content = course['content']
@@ -242,7 +531,31 @@ class UBCCourseAssistant:
 
         return response
 
-    def ask(self, question):
+    @_pinned
+    def ask(self, question, conversation=None, campus=None, year=None, session=None):
+        """Answer a question, recording it in the conversation history.
+
+        Pass a ConversationWindow to keep per-user history when one assistant
+        instance is shared between users (e.g. by the API server). `campus`,
+        `year` and `session` are the user's settings for which partition of
+        the catalog to search; a campus or term named in the question wins.
+        """
+        if conversation is None:
+            conversation = self.conversation
+        self._local.partitions = self._current_store().router.route(question, campus, year, session)
+        # Concurrent questions in flight, used to shrink the rerank budget under load
+        with self._inflight_lock:
+            self._inflight += 1
+        try:
+            result = self._answer(question, conversation)
+        finally:
+            with self._inflight_lock:
+                self._inflight -= 1
+            self._local.partitions = None
+        conversation.add_turn(question, result['answer'])
+        return result
+
+    def _answer(self, question, conversation):
         """Enhanced ask method with better error handling"""
         try:
             # Extract department and course number
@@ -250,6 +563,22 @@ class UBCCourseAssistant:
             course_num = self._extract_course_number(question)
             is_listing = self._is_listing_query(question)
 
+            # Follow-up about the course discussed last ("what are its prereqs?")
+            if not course_num and not dept and self._is_follow_up(question):
+                previous = conversation.last_course_code()
+                if previous:
+                    course_num, is_listing = previous, False
+
+            # Strategy 0: Courses like a given one, from the similarity table
+            if course_num and self._is_similarity_query(question):
+                same_dept = 'same department' in question.lower()
+                similar = self.similar_courses(course_num, k=10, same_dept=same_dept)
+                matches = [(self.get_course(s['code']), s['score']) for s in similar]
+                matches = [(course, score) for course, score in matches if course]
+                if matches:
+                    answer = self._format_similar_courses(self._normalize_code(course_num), matches)
+                    return {'answer': answer, 'sources': [course for course, _ in matches]}
+
             # Strategy 1: Department listing (most reliable)
             if is_listing and dept:
                 courses = self._get_all_courses_by_department(dept)
@@ -259,6 +588,11 @@ class UBCCourseAssistant:
 
             # Strategy 2: Specific course query (e.g., "What is CPSC 110?")
             if course_num and not is_listing:
+                # Exact catalog hit skips embedding and vector search entirely
+                exact = self.get_course(course_num)
+                if exact:
+                    return {'answer': self._format_single_course(exact), 'sources': [exact]}
+
                 courses = self._search_by_semantic(course_num, k=3)
                 if courses:
                     # Return the most relevant match
@@ -276,8 +610,9 @@ class UBCCourseAssistant:
                 answer = self._format_course_list(courses, dept, max_display=15)
                 return {'answer': answer, 'sources': courses}
 
-            # Strategy 4: General question - semantic search
-            courses = self._search_by_semantic(question, k=5)
+            # Strategy 4: General question - semantic search, reranked since
+            # only the top hit is shown
+            courses = self._search_by_semantic(question, k=5, rerank=True)
             if courses:
                 # For general questions, show the most relevant course
                 answer = self._format_single_course(courses[0])
@@ -297,7 +632,24 @@ class UBCCourseAssistant:
 
     def reset_conversation(self):
         """Clear conversation history"""
-        pass
+        self.conversation.clear()
+
+
+class SessionAssistant:
+    """A shared assistant seen through one user's own conversation window"""
+
+    def __init__(self, assistant):
+        self._assistant = assistant
+        self.conversation = ConversationWindow()
+
+    def ask(self, question, **kwargs):
+        return self._assistant.ask(question, self.conversation, **kwargs)
+
+    def reset_conversation(self):
+        self.conversation.clear()
+
+    def __getattr__(self, name):
+        return getattr(self._assistant, name)
 
 
 # Test the chatbot
@@ -1,26 +1,67 @@
 # chatbot_free_upgrade.py
 import os
+from typing import Any
 from langchain_community.vectorstores import Chroma
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_classic.chains import ConversationalRetrievalChain
 from langchain_classic.memory import ConversationBufferMemory
 from langchain_classic.prompts import PromptTemplate
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, get_buffer_string
+from conversation_memory import ConversationWindow
 #codebase
 # For local LLM
 from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
 
+class WindowedConversationMemory(ConversationBufferMemory):
+    """ConversationBufferMemory with a turn/token budget instead of unbounded history"""
+    max_turns: int = 4
+    max_tokens: int = 800
+    window: Any = None
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.window = ConversationWindow(max_turns=self.max_turns, max_tokens=self.max_tokens)
+
+    def load_memory_variables(self, inputs):
+        messages = []
+        summary = self.window.summary()
+        if summary:
+            messages.append(SystemMessage(content=summary))
+        for question, answer in self.window.history():
+            messages.append(HumanMessage(content=question))
+            messages.append(AIMessage(content=answer))
+        if not self.return_messages:
+            messages = get_buffer_string(messages, human_prefix=self.human_prefix, ai_prefix=self.ai_prefix)
+        return {self.memory_key: messages}
+
+    def save_context(self, inputs, outputs):
+        question, answer = self._get_input_output(inputs, outputs)
+        self.window.add_turn(question, answer)
+
+    def clear(self):
+        self.window.clear()
+
+
 class UBCCourseAssistant:
-    def __init__(self, persist_directory='./chroma_db'):
-        print("Loading stronger embeddings model...")
-        # Free, stronger embeddings
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="all-MiniLM-L12-v2",  # Free and high-quality
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={'normalize_embeddings': True}
-        )
+    def __init__(self, persist_directory='./chroma_db', embeddings=None, llm=None, collection_name='langchain'):
+        """Load embeddings, vector store and LLM.
+
+        `embeddings` and `llm` replace the Hugging Face models, e.g. with the
+        offline stand-ins in loadtest.py.
+        """
+        if embeddings is None:
+            print("Loading stronger embeddings model...")
+            # Free, stronger embeddings
+            embeddings = HuggingFaceEmbeddings(
+                model_name="all-MiniLM-L12-v2",  # Free and high-quality
+                model_kwargs={'device': 'cpu'},
+                encode_kwargs={'normalize_embeddings': True}
+            )
+        self.embeddings = embeddings
 
         print("Loading vector store...")
         self.vectorstore = Chroma(
+            collection_name=collection_name,
             persist_directory=persist_directory,
             embedding_function=self.embeddings
         )
@@ -28,25 +69,28 @@ class UBCCourseAssistant:
             search_kwargs={"k": 10}  # get top 10 docs
         )
 
-        print("Loading local LLM (Llama 2 7B)...")
-        # Load Hugging Face Llama 2 7B (chat version)
-        # Make sure you have downloaded the model locally or use HF cache
-        model_name = "meta-llama/Llama-2-7b-chat-hf"
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModelForCausalLM.from_pretrained(
-            model_name,
-            device_map="auto",
-            torch_dtype="auto"
-        )
-
-        # Create a text-generation pipeline for chat
-        self.llm_pipeline = pipeline(
-            "text-generation",
-            model=self.model,
-            tokenizer=self.tokenizer,
-            max_length=512,
-            temperature=0.3
-        )
+        if llm is not None:
+            self.llm_pipeline = llm
+        else:
+            print("Loading local LLM (Llama 2 7B)...")
+            # Load Hugging Face Llama 2 7B (chat version)
+            # Make sure you have downloaded the model locally or use HF cache
+            model_name = "meta-llama/Llama-2-7b-chat-hf"
+            self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+            self.model = AutoModelForCausalLM.from_pretrained(
+                model_name,
+                device_map="auto",
+                torch_dtype="auto"
+            )
+
+            # Create a text-generation pipeline for chat
+            self.llm_pipeline = pipeline(
+                "text-generation",
+                model=self.model,
+                tokenizer=self.tokenizer,
+                max_length=512,
+                temperature=0.3
+            )
 
         # Prompt template
         template = """You are a helpful UBC Course Assistant chatbot. 
@@ -65,8 +109,8 @@ Helpful Answer:"""
             input_variables=["context", "question"]
         )
 
-        # Memory for conversation
-        self.memory = ConversationBufferMemory(
+        # Bounded memory: recent turns verbatim, older ones as course codes
+        self.memory = WindowedConversationMemory(
             memory_key="chat_history",
             return_messages=True,
             output_key="answer"
@@ -0,0 +1,103 @@
+# conversation_memory.py
+"""Bounded conversation memory shared by both chatbot implementations.
+
+The last `max_turns` turns are kept verbatim as long as they fit in the
+`max_tokens` budget; older turns are folded into a short summary made of the
+course codes they mentioned, so memory (and everything that is re-fed from
+it) stays constant no matter how long a session runs.
+"""
+import re
+import threading
+from collections import deque
+
+COURSE_CODE_PATTERN = re.compile(r'\b([A-Za-z]{2,4})\s*[-_]?\s*(\d{3}[A-Za-z]?)\b')
+
+# Words that look like a subject code in front of a number ("the 100 level")
+NOT_SUBJECTS = {'THE', 'AND', 'ARE', 'ALL', 'FOR', 'ANY', 'TOP', 'IS', 'OF', 'TO', 'IN', 'OR', 'AT', 'ON'}
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token for English text)"""
+    return max(1, len(text) // 4)
+
+
+def extract_course_codes(text):
+    """Course codes mentioned in text, normalized to 'DEPT 123', in order"""
+    codes = []
+    for dept, number in COURSE_CODE_PATTERN.findall(text):
+        if dept.upper() in NOT_SUBJECTS:
+            continue
+        code = f"{dept.upper()} {number.upper()}"
+        if code not in codes:
+            codes.append(code)
+    return codes
+
+
+class ConversationWindow:
+    """Recent turns verbatim, older turns compressed to mentioned course codes"""
+
+    def __init__(self, max_turns=4, max_tokens=800, max_answer_chars=600, max_summary_codes=20):
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.max_answer_chars = max_answer_chars
+        self.max_summary_codes = max_summary_codes
+        self.turns = deque()
+        self.summary_codes = []
+        self._tokens = 0
+        self._lock = threading.Lock()
+
+    def add_turn(self, question, answer):
+        """Record a turn, evicting the oldest ones into the summary if over budget"""
+        if len(answer) > self.max_answer_chars:
+            answer = answer[:self.max_answer_chars] + "..."
+        codes = extract_course_codes(question) + extract_course_codes(answer)
+        tokens = estimate_tokens(question) + estimate_tokens(answer)
+        with self._lock:
+            self.turns.append((question, answer, codes, tokens))
+            self._tokens += tokens
+
+            # Always keep the newest turn, even if it alone exceeds the budget
+            while len(self.turns) > 1 and (len(self.turns) > self.max_turns or self._tokens > self.max_tokens):
+                _, _, old_codes, old_tokens = self.turns.popleft()
+                self._tokens -= old_tokens
+                self._remember_codes(old_codes)
+
+    def _remember_codes(self, codes):
+        for code in codes:
+            if code in self.summary_codes:
+                self.summary_codes.remove(code)
+            self.summary_codes.append(code)
+        del self.summary_codes[:-self.max_summary_codes]
+
+    def history(self):
+        """Verbatim (question, answer) pairs of the recent turns"""
+        with self._lock:
+            return [(question, answer) for question, answer, _, _ in self.turns]
+
+    def summary(self):
+        """One-line summary of evicted turns, or '' if nothing was evicted"""
+        with self._lock:
+            summary_codes = list(self.summary_codes)
+        if not summary_codes:
+            return ""
+        return "Earlier in this conversation the student asked about: " + ", ".join(summary_codes) + "."
+
+    def last_course_code(self):
+        """Most recently mentioned course code, for resolving follow-up questions"""
+        with self._lock:
+            turns = list(self.turns)
+            summary_codes = list(self.summary_codes)
+        for question, _, codes, _ in reversed(turns):
+            # Prefer what the student asked about over codes listed in answers
+            asked = extract_course_codes(question)
+            if asked:
+                return asked[-1]
+            if codes:
+                return codes[0]
+        return summary_codes[-1] if summary_codes else None
+
+    def clear(self):
+        with self._lock:
+            self.turns.clear()
+            self.summary_codes = []
+            self._tokens = 0
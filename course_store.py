@@ -0,0 +1,152 @@
+# course_store.py
+import json
+import os
+import threading
+import chromadb
+from chromadb.api.client import SharedSystemClient
+from validation import normalize_course_code
+from similarity import load_similarity_table
+from typeahead import PrefixIndex
+from partitions import LegacyPartition, Partition, PartitionRouter, partition_of
+import snapshots
+
+
+class CourseStore:
+    """One loaded version of the catalog, its Chroma collections and lookup indexes.
+
+    A store is never modified after loading; refreshing the index means
+    loading a new store and swapping the reference to it. Courses are split
+    into campus/year/session partitions, each with its own collection and
+    indexes, and `router` picks the partitions a question should use.
+    """
+
+    def __init__(self, version, client, collections, courses, similarity=None, default_campus=None, path=None):
+        self.version = version
+        self.client = client
+        self.path = path
+        # Lease keeping prune_snapshots() off this version, set by from_snapshot()
+        self.lease = None
+        self.collections = collections
+        self.courses = courses
+        self.similarity = similarity
+        self.partitions = list(collections)
+        self.router = PartitionRouter(self.partitions, default_campus=default_campus)
+
+        # Index courses by department and by exact course code, per partition
+        by_key = {partition.key: partition for partition in self.partitions}
+        legacy = len(self.partitions) == 1 and isinstance(self.partitions[0], LegacyPartition)
+        self.dept_courses = {partition.key: {} for partition in self.partitions}
+        self.course_index = {partition.key: {} for partition in self.partitions}
+        for course in self.courses:
+            key = 'all' if legacy else Partition(*partition_of(course)).key
+            if key not in by_key:
+                continue
+            dept = course['department']
+            if dept not in self.dept_courses[key]:
+                self.dept_courses[key][dept] = []
+            self.dept_courses[key][dept].append(course)
+            self.course_index[key].setdefault(normalize_course_code(course['course_code']), course)
+
+        # Prefix index over codes and titles of the default partitions
+        default_view = {}
+        for partition in self.router.route():
+            for code, course in self.course_index[partition.key].items():
+                default_view.setdefault(code, course)
+        self.typeahead = PrefixIndex(default_view.values())
+
+        # Requests using this store; it is closed once retired and unused
+        self._users = 0
+        self._retired = False
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            self._users += 1
+
+    def release(self):
+        with self._lock:
+            self._users -= 1
+            idle = self._retired and self._users == 0
+        if idle:
+            self.close()
+
+    def retire(self):
+        """Mark the store as replaced; it closes when the last request using it finishes"""
+        with self._lock:
+            self._retired = True
+            idle = self._users == 0
+        if idle:
+            self.close()
+
+    def close(self):
+        """Stop this store's Chroma system.
+
+        Chroma caches one system (sqlite connection, HNSW segments) per
+        persist directory for the life of the process, so without this every
+        swapped-out snapshot would stay in memory.
+        """
+        system = SharedSystemClient._identifer_to_system.pop(self.path, None)
+        if system is not None:
+            system.stop()
+        if self.lease:
+            snapshots.release_lease(self.lease)
+            self.lease = None
+
+    def lookup(self, code, partitions):
+        """Course record for a normalized code from the first partition that has it"""
+        for partition in partitions:
+            course = self.course_index[partition.key].get(code)
+            if course:
+                return course
+        return None
+
+    def department(self, dept, partitions):
+        """Courses of a department across partitions, newest offering of each code"""
+        courses = {}
+        for partition in partitions:
+            for course in self.dept_courses[partition.key].get(dept, []):
+                courses.setdefault(course['course_code'], course)
+        return list(courses.values())
+
+    @classmethod
+    def from_snapshot(cls, path, embedding_function, default_campus=None):
+        """Load a published snapshot directory"""
+        manifest = snapshots.read_manifest(path)
+        chroma_path = os.path.join(path, snapshots.CHROMA_DIR)
+        client = chromadb.PersistentClient(path=chroma_path)
+        if 'partitions' in manifest:
+            partitions = [Partition.from_dict(p) for p in manifest['partitions']]
+        else:
+            partitions = [LegacyPartition()]
+        collections = {
+            partition: client.get_collection(
+                name=partition.collection_name,
+                embedding_function=embedding_function
+            )
+            for partition in partitions
+        }
+        with open(os.path.join(path, snapshots.COURSES_FILE), 'r', encoding='utf-8') as f:
+            courses = json.load(f)
+        similarity = load_similarity_table(os.path.join(path, snapshots.SIMILARITY_FILE))
+        store = cls(manifest['version'], client, collections, courses, similarity, default_campus, chroma_path)
+        store.lease = snapshots.acquire_lease(path)
+        return store
+
+    @classmethod
+    def from_directory(cls, persist_directory, embedding_function, courses_path='data/raw/ubc_courses.json',
+                       default_campus=None):
+        """Load an unversioned, unpartitioned Chroma directory plus the raw catalog JSON"""
+        client = chromadb.PersistentClient(path=persist_directory)
+        collection = client.get_collection(
+            name="courses",
+            embedding_function=embedding_function
+        )
+        try:
+            with open(courses_path, 'r', encoding='utf-8') as f:
+                courses = json.load(f)
+        except Exception as e:
+            print(f"Warning: Could not load courses: {e}")
+            courses = []
+        similarity = load_similarity_table(os.path.join(persist_directory, snapshots.SIMILARITY_FILE))
+        return cls('unversioned', client, {LegacyPartition(): collection}, courses, similarity, default_campus,
+                   persist_directory)
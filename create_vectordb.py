@@ -1,17 +1,29 @@
 # create_vectordb.py
 import json
+import os
+import time
 import chromadb
+import numpy as np
 from chromadb.utils import embedding_functions
 from langchain_core.documents import Document
 from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+from validation import validate_courses, print_report
+from similarity import load_similarity_table, update_similarity_table
+import snapshots
+from partitions import Partition, partition_of, split_by_partition
 
 def load_course_data(filepath='data/raw/ubc_courses.json'):
     """Load course data from JSON"""
     with open(filepath, 'r', encoding='utf-8') as f:
         return json.load(f)
 
-def create_documents(courses):
+def create_documents(courses, validate=True):
     """Enhanced document creation with better metadata"""
+    # Never embed the same course twice or embed malformed records
+    if validate:
+        courses, report = validate_courses(courses)
+        print_report(report)
+
     documents = []
     for course in courses:
         # Add prerequisites to content if available
@@ -33,6 +45,7 @@ def create_documents(courses):
             'session': course['session'],
             'course_level': course['course_code'][-3] if len(course['course_code']) >= 3 else '0',
             'source': 'UBC Course Catalog',
+            'content_hash': course['content_hash'],
             'full_text': content  # Store full text in metadata
         }
 
@@ -40,17 +53,45 @@ def create_documents(courses):
         documents.append(doc)
     return documents
 
-def create_vector_store(documents, persist_directory='./chroma_db'):
+def load_previous_embeddings(previous_path):
+    """Map content hash -> embedding from a previous snapshot, for reuse"""
+    if not previous_path:
+        return {}
+    try:
+        with open(os.path.join(previous_path, snapshots.COURSES_FILE), 'r', encoding='utf-8') as f:
+            courses = json.load(f)
+        embeddings = np.load(os.path.join(previous_path, snapshots.EMBEDDINGS_FILE))
+        return {course['content_hash']: vector for course, vector in zip(courses, embeddings)}
+    except Exception as e:
+        print(f"Warning: Could not reuse previous embeddings: {e}")
+        return {}
+
+def embed_documents(documents, embedding_function, previous_path=None, batch_size=64):
+    """Embed documents, reusing vectors of unchanged courses from the previous snapshot"""
+    previous = load_previous_embeddings(previous_path)
+    vectors = [previous.get(doc.metadata['content_hash']) for doc in documents]
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    print(f"Reusing {len(documents) - len(missing)} embeddings, computing {len(missing)}")
+
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start:start + batch_size]
+        for i, vector in zip(batch, embedding_function([documents[i].page_content for i in batch])):
+            vectors[i] = vector
+    return np.asarray(vectors, dtype=np.float32)
+
+def create_vector_store(documents, persist_directory='./chroma_db', embeddings=None, embedding_function=None,
+                        name="courses"):
     """Create vector store with ChromaDB"""
     client = chromadb.PersistentClient(path=persist_directory)
     
-    embedding_function = SentenceTransformerEmbeddingFunction(
-        model_name="paraphrase-MiniLM-L3-v2"  # Using a smaller, more stable model
-    )
+    if embedding_function is None:
+        embedding_function = SentenceTransformerEmbeddingFunction(
+            model_name=snapshots.EMBEDDING_MODEL  # Using a smaller, more stable model
+        )
     
     # Create new collection
     collection = client.create_collection(
-        name="courses",
+        name=name,
         embedding_function=embedding_function,
         metadata={"hnsw:space": "cosine"}
     )
@@ -60,27 +101,109 @@ def create_vector_store(documents, persist_directory='./chroma_db'):
     for i in range(0, len(documents), batch_size):
         batch = documents[i:i + batch_size]
         collection.add(
-            ids=[str(j) for j in range(i, i + len(batch))],
+            # Course codes are unique after validation, so they make stable ids
+            ids=[doc.metadata['course_code'] for doc in batch],
             documents=[doc.page_content for doc in batch],
-            metadatas=[doc.metadata for doc in batch]
+            metadatas=[doc.metadata for doc in batch],
+            embeddings=embeddings[i:i + batch_size].tolist() if embeddings is not None else None
         )
         print(f"Added batch {i//batch_size + 1}/{len(documents)//batch_size + 1}")
     
     return collection
 
+def create_partitioned_store(documents, embeddings, persist_directory, embedding_function):
+    """One collection per campus/year/session partition, newest partition first"""
+    rows = split_by_partition([dict(doc.metadata, row=i) for i, doc in enumerate(documents)])
+    collections = {}
+    for partition, members in rows.items():
+        idx = [m['row'] for m in members]
+        print(f"Partition {partition.key}: {len(idx)} courses -> {partition.collection_name}")
+        collections[partition] = create_vector_store(
+            [documents[i] for i in idx],
+            persist_directory,
+            embeddings[idx],
+            embedding_function,
+            name=partition.collection_name
+        )
+    return collections
+
+def build_similarity(documents, embeddings, path, previous_path=None, k=20):
+    """Compute (or incrementally refresh) the course-to-course neighbour table"""
+    previous = None
+    if previous_path:
+        previous = load_similarity_table(os.path.join(previous_path, snapshots.SIMILARITY_FILE))
+    table = update_similarity_table(
+        previous,
+        # Course codes repeat across partitions, so rows are keyed per partition
+        codes=[Partition(*partition_of(doc.metadata)).record_id(doc.metadata['course_code']) for doc in documents],
+        departments=[doc.metadata['department'] for doc in documents],
+        embeddings=embeddings,
+        hashes=[doc.metadata['content_hash'] for doc in documents],
+        k=k
+    )
+    table.save(path)
+    print(f"Saved top-{table.k} neighbours for {len(table.codes)} courses to {path}")
+    return table
+
+def write_snapshot(courses, root=snapshots.SNAPSHOT_ROOT, embedding_function=None,
+                   embedding_model=snapshots.EMBEDDING_MODEL):
+    """Build a complete new snapshot from validated courses and publish it"""
+    previous_version = snapshots.current_version(root)
+    previous_path = snapshots.snapshot_path(root, previous_version) if previous_version else None
+    if previous_path and snapshots.read_manifest(previous_path).get('embedding_model') != embedding_model:
+        # Vectors from another model can't be reused
+        previous_path = None
+    version, path = snapshots.begin_snapshot(root)
+    print(f"Writing snapshot {version} (previous: {previous_version or 'none'})")
+
+    documents = create_documents(courses, validate=False)
+    with open(os.path.join(path, snapshots.COURSES_FILE), 'w', encoding='utf-8') as f:
+        json.dump(courses, f, indent=2, ensure_ascii=False)
+
+    print("Embedding courses...")
+    if embedding_function is None:
+        embedding_function = SentenceTransformerEmbeddingFunction(model_name=embedding_model)
+    embeddings = embed_documents(documents, embedding_function, previous_path)
+    np.save(os.path.join(path, snapshots.EMBEDDINGS_FILE), embeddings)
+
+    print("Creating vector store...")
+    collections = create_partitioned_store(
+        documents, embeddings, os.path.join(path, snapshots.CHROMA_DIR), embedding_function
+    )
+
+    print("Building course similarity table...")
+    build_similarity(documents, embeddings, os.path.join(path, snapshots.SIMILARITY_FILE), previous_path)
+
+    # Publishing flips CURRENT; running assistants pick the new version up
+    snapshots.publish_snapshot(root, version, {
+        'version': version,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'previous_version': previous_version,
+        'embedding_model': embedding_model,
+        'partitions': [
+            dict(partition.to_dict(), course_count=collection.count())
+            for partition, collection in collections.items()
+        ],
+        'course_count': len(courses),
+        'embedding_dim': int(embeddings.shape[1]) if len(embeddings) else 0,
+    })
+    print(f"✓ Published snapshot {version}")
+    return collections
+
 def main():
     print("Loading course data...")
     courses = load_course_data()
     print(f"Loaded {len(courses)} courses")
 
-    print("Creating documents...")
-    documents = create_documents(courses)
+    print("Validating courses...")
+    courses, report = validate_courses(courses)
+    print_report(report)
 
-    print("Creating vector store...")
-    collection = create_vector_store(documents)
+    collections = write_snapshot(courses)
 
-    # Test using ChromaDB query method
+    # Test using ChromaDB query method on the newest partition
     print("\nTesting vector store...")
+    collection = next(iter(collections.values()))
     results = collection.query(
         query_texts=["CPSC 110"],
         n_results=3
@@ -0,0 +1,537 @@
+# loadtest.py
+"""Multi-user load generator and latency SLO report.
+
+Replays a realistic question mix (exact course codes, department listings,
+topics, general questions, "courses like X") against one of the entry points
+at a configurable concurrency or arrival rate, and reports throughput and
+p50/p95/p99 latency per question type, plus CPU and RSS of this process.
+
+The assistant and upgrade targets run offline: a
+deterministic hashing embedding stands in for the sentence-transformers model
+and a temporary index is built from the catalog, so no model is downloaded.
+The streamlit target drives app.py unchanged, so without --url it loads the
+real model and the index configured in the environment. Examples:
+
+    python loadtest.py --target assistant --concurrency 50 --duration 30
+    python loadtest.py --target assistant --rate 100 --requests 2000 --slo-p95-ms 250
+    python loadtest.py --target http --url http://127.0.0.1:8000 --concurrency 20
+    python loadtest.py --target streamlit --concurrency 4 --requests 200
+    python loadtest.py --target upgrade --concurrency 4 --requests 100 --llm-latency-ms 50
+
+The exit code is 1 when an SLO given on the command line is violated, so the
+script can gate deploys.
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import queue
+import random
+import re
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from conversation_memory import ConversationWindow, extract_course_codes
+
+DEFAULT_MIX = {
+    'exact_code': 0.40,
+    'department': 0.20,
+    'topic': 0.25,
+    'general': 0.10,
+    'similar': 0.05,
+}
+
+TOPICS = [
+    'machine learning', 'climate change', 'organic chemistry', 'statistics',
+    'software engineering', 'linear algebra', 'microeconomics', 'ancient history',
+    'cognitive psychology', 'music composition', 'marine biology', 'databases',
+    'creative writing', 'urban planning', 'nutrition', 'political theory',
+]
+
+GENERAL_QUESTIONS = [
+    "How can I learn to program?",
+    "I want to understand how the brain works",
+    "What should I take to prepare for medical school?",
+    "Something about sustainability and forests",
+    "I like writing stories",
+    "Where can I study world religions?",
+]
+
+
+class HashingEmbeddingFunction:
+    """Deterministic offline stand-in for the sentence-transformers model.
+
+    Signed feature hashing of word unigrams and bigrams into `dim` buckets,
+    L2-normalized. It keeps lexical overlap meaningful, which is enough to
+    exercise retrieval code paths at realistic cost without downloading a model.
+    """
+
+    def __init__(self, dim=256):
+        self.dim = dim
+        self.model_name = f"hashing-{dim}"
+
+    def _embed(self, text):
+        vector = [0.0] * self.dim
+        tokens = re.findall(r'[a-z0-9]+', text.lower())
+        for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+            h = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'little')
+            vector[h % self.dim] += 1.0 if (h >> 32) & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def __call__(self, input):
+        return [self._embed(text) for text in input]
+
+    # LangChain Embeddings interface, for the chatbot_upgrade target
+    def embed_documents(self, texts):
+        return self(texts)
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+class OverlapCrossEncoder:
+    """Deterministic offline stand-in for the reranking cross-encoder.
+
+    Scores a (query, document) pair by the fraction of query words found in
+    the document; `latency_ms` simulates the per-pair model cost.
+    """
+
+    def __init__(self, latency_ms=0.0):
+        self.delay = latency_ms / 1000.0
+
+    def predict(self, pairs):
+        if self.delay:
+            time.sleep(self.delay * len(pairs))
+        scores = []
+        for query, document in pairs:
+            words = set(re.findall(r'[a-z0-9]+', query.lower()))
+            found = set(re.findall(r'[a-z0-9]+', document.lower()))
+            scores.append(len(words & found) / (len(words) or 1))
+        return scores
+
+
+def make_fake_llm(latency_ms=0.0):
+    """Deterministic LangChain LLM that stands in for Llama-2.
+
+    Condensing prompts get the follow-up question back unchanged; answer
+    prompts get a one-line answer citing the first course code in the
+    context. `latency_ms` simulates generation time.
+    """
+    from langchain_core.language_models.llms import LLM
+
+    class DeterministicLLM(LLM):
+        delay: float = 0.0
+
+        @property
+        def _llm_type(self):
+            return 'deterministic-fake'
+
+        def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+            if self.delay:
+                time.sleep(self.delay)
+            match = re.search(r'Follow Up Input:\s*(.+)', prompt)
+            if match:
+                return match.group(1).strip()
+            codes = extract_course_codes(prompt.split('Question:')[0])
+            if not codes:
+                return "I don't know based on the course catalog."
+            return f"{codes[0]} is the most relevant course for this question."
+
+    return DeterministicLLM(delay=latency_ms / 1000.0)
+
+
+def build_question_mix(courses, mix, count, seed=0):
+    """[(question_type, question), ...] drawn from the catalog according to `mix`"""
+    rng = random.Random(seed)
+    codes = sorted({course['course_code'] for course in courses})
+    departments = sorted({course['department'] for course in courses})
+    generators = {
+        'exact_code': lambda: rng.choice([
+            "What is {} about?", "Tell me about {}", "What are the prerequisites for {}?", "{}"
+        ]).format(rng.choice(codes)),
+        'department': lambda: rng.choice([
+            "List all {} courses", "Give me all {} courses", "Show me {} courses"
+        ]).format(rng.choice(departments)),
+        'topic': lambda: rng.choice([
+            "What {} courses are available?", "Show me courses about {}", "Which courses cover {}?"
+        ]).format(rng.choice(TOPICS)),
+        'general': lambda: rng.choice(GENERAL_QUESTIONS),
+        'similar': lambda: "What courses are similar to {}?".format(rng.choice(codes)),
+    }
+    kinds = [kind for kind in mix if mix[kind] > 0]
+    weights = [mix[kind] for kind in kinds]
+    return [(kind, generators[kind]()) for kind in rng.choices(kinds, weights, k=count)]
+
+
+def parse_mix(text):
+    """'exact_code=0.5,topic=0.5' -> {'exact_code': 0.5, 'topic': 0.5}"""
+    mix = {}
+    for part in text.split(','):
+        kind, _, weight = part.partition('=')
+        kind = kind.strip()
+        if kind not in DEFAULT_MIX:
+            raise ValueError(f"Unknown question type '{kind}', expected one of {', '.join(DEFAULT_MIX)}")
+        mix[kind] = float(weight)
+    return mix
+
+
+def build_offline_index(courses, workdir, embedding_function):
+    """Build and publish a snapshot with the stand-in embedding under `workdir`"""
+    from create_vectordb import write_snapshot
+    from validation import validate_courses
+
+    courses, _ = validate_courses(courses)
+    root = os.path.join(workdir, 'snapshots')
+    write_snapshot(courses, root=root, embedding_function=embedding_function,
+                   embedding_model=embedding_function.model_name)
+    return root
+
+
+# Targets: each returns a factory of per-user sessions; a session is a
+# callable taking a question and raising on failure.
+
+def assistant_target(args, courses, workdir):
+    from chatbot import UBCCourseAssistant
+
+    from rerank import CrossEncoderReranker
+
+    embedding_function = HashingEmbeddingFunction()
+    reranker = None
+    if args.rerank:
+        reranker = CrossEncoderReranker(
+            model=OverlapCrossEncoder(args.rerank_latency_ms),
+            budget_ms=args.rerank_budget_ms,
+            max_concurrency=os.cpu_count() or 1
+        )
+    assistant = UBCCourseAssistant(
+        snapshot_root=build_offline_index(courses, workdir, embedding_function),
+        watch_interval=0,
+        embedding_function=embedding_function,
+        embedding_model=embedding_function.model_name,
+        batch_max_wait_ms=args.batch_max_wait_ms,
+        batch_max_size=args.batch_max_size,
+        rerank_model=None,
+        reranker=reranker,
+    )
+
+    def new_session():
+        conversation = ConversationWindow()
+        return lambda question: assistant.ask(question, conversation)
+
+    return new_session, assistant
+
+
+def http_target(args, courses, workdir):
+    import uuid
+    import requests
+
+    def new_session():
+        http = requests.Session()
+        session_id = uuid.uuid4().hex
+
+        def ask(question):
+            response = http.post(
+                f"{args.url.rstrip('/')}/ask",
+                json={'question': question, 'session_id': session_id},
+                timeout=args.timeout
+            )
+            response.raise_for_status()
+            return response.json()
+
+        return ask
+
+    return new_session, None
+
+
+def streamlit_target(args, courses, workdir):
+    from streamlit.testing.v1 import AppTest
+
+    # Every virtual user is its own Streamlit session running app.py as
+    # deployed: sessions share the process's assistant (loaded from the
+    # environment, so the real model and index) or the API server with --url
+    if args.url:
+        os.environ['ASSISTANT_API_URL'] = args.url
+
+    def new_session():
+        app = AppTest.from_file('app.py', default_timeout=args.timeout)
+        app.run()
+
+        def ask(question):
+            app.chat_input[0].set_value(question).run()
+            if app.exception:
+                raise RuntimeError(app.exception[0].message)
+
+        return ask
+
+    return new_session, None
+
+
+def upgrade_target(args, courses, workdir):
+    from langchain_community.vectorstores import Chroma
+    from chatbot_upgrade import UBCCourseAssistant as UpgradedAssistant
+    from create_vectordb import create_documents
+
+    embeddings = HashingEmbeddingFunction()
+    persist_directory = os.path.join(workdir, 'upgrade')
+    Chroma.from_documents(
+        create_documents(courses),
+        embedding=embeddings,
+        persist_directory=persist_directory,
+        collection_name='langchain'
+    )
+    llm = make_fake_llm(args.llm_latency_ms)
+
+    def new_session():
+        # The upgraded assistant keeps conversation memory per instance
+        assistant = UpgradedAssistant(persist_directory=persist_directory, embeddings=embeddings, llm=llm)
+        return assistant.ask
+
+    return new_session, None
+
+
+TARGETS = {
+    'assistant': assistant_target,
+    'http': http_target,
+    'streamlit': streamlit_target,
+    'upgrade': upgrade_target,
+}
+
+
+def _rss_mb():
+    """Current resident set size of this process in MB"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1e6
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def run_load(new_session, questions, concurrency, duration=None, rate=None):
+    """Replay `questions` and return [(question_type, latency_s, ok), ...].
+
+    Without `rate` this is a closed loop: `concurrency` users each send the
+    next question as soon as their previous one is answered. With `rate`,
+    questions arrive as a Poisson process at `rate` per second and are served
+    by `concurrency` users; latency then includes time spent waiting for a
+    free user, as a real queue would.
+    """
+    results = []
+    results_lock = threading.Lock()
+    deadline = time.monotonic() + duration if duration else None
+    pending = queue.Queue()
+
+    def record(kind, started, ok):
+        with results_lock:
+            results.append((kind, time.monotonic() - started, ok))
+
+    def serve():
+        ask = new_session()
+        while True:
+            item = pending.get()
+            if item is None:
+                return
+            kind, question, arrived = item
+            started = arrived if arrived is not None else time.monotonic()
+            try:
+                ask(question)
+                record(kind, started, True)
+            except Exception as e:
+                print(f"  ✗ {kind}: {e}")
+                record(kind, started, False)
+
+    workers = [threading.Thread(target=serve, daemon=True) for _ in range(concurrency)]
+    for worker in workers:
+        worker.start()
+
+    rng = random.Random(1)
+    next_arrival = time.monotonic()
+    for i in range(len(questions) if deadline is None else sys.maxsize):
+        if deadline is not None and time.monotonic() >= deadline:
+            break
+        kind, question = questions[i % len(questions)]
+        if rate:
+            next_arrival += rng.expovariate(rate)
+            time.sleep(max(0.0, next_arrival - time.monotonic()))
+            pending.put((kind, question, time.monotonic()))
+        else:
+            # Closed loop: only keep as many questions queued as there are users
+            while pending.qsize() >= concurrency:
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+                time.sleep(0.0005)
+            pending.put((kind, question, None))
+
+    for _ in workers:
+        pending.put(None)
+    for worker in workers:
+        worker.join()
+    return results
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, math.ceil(p / 100.0 * len(values)) - 1))]
+
+
+def summarize(results, wall_time, cpu_time, rss_mb, peak_rss_mb):
+    by_kind = defaultdict(list)
+    errors = defaultdict(int)
+    for kind, latency, ok in results:
+        if ok:
+            by_kind[kind].append(latency * 1000.0)
+            by_kind['all'].append(latency * 1000.0)
+        else:
+            errors[kind] += 1
+            errors['all'] += 1
+
+    strategies = {}
+    for kind in sorted(by_kind, key=lambda k: (k == 'all', k)):
+        latencies = sorted(by_kind[kind])
+        strategies[kind] = {
+            'count': len(latencies),
+            'errors': errors[kind],
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'p99_ms': percentile(latencies, 99),
+            'max_ms': latencies[-1] if latencies else 0.0,
+        }
+    ok = sum(1 for _, _, success in results if success)
+    return {
+        'requests': len(results),
+        'errors': len(results) - ok,
+        'wall_s': wall_time,
+        'throughput_rps': ok / wall_time if wall_time else 0.0,
+        'cpu_percent': 100.0 * cpu_time / wall_time if wall_time else 0.0,
+        'rss_mb': rss_mb,
+        'peak_rss_mb': peak_rss_mb,
+        'strategies': strategies,
+    }
+
+
+def print_report(report, args):
+    print("\n" + "=" * 70)
+    mode = f"rate {args.rate}/s" if args.rate else "closed loop"
+    print(f"Target: {args.target}   users: {args.concurrency}   {mode}   wall: {report['wall_s']:.1f}s")
+    print(f"Requests: {report['requests']} ({report['errors']} errors)   "
+          f"Throughput: {report['throughput_rps']:.1f} req/s")
+    # Against a server, this process is only the load generator
+    label = "Load generator CPU" if report['remote'] else "CPU"
+    print(f"{label}: {report['cpu_percent']:.0f}% of one core   "
+          f"RSS: {report['rss_mb']:.0f} MB (peak {report['peak_rss_mb']:.0f} MB)")
+    if 'batcher' in report:
+        batcher = report['batcher']
+        print(f"Embedding batches: mean size {batcher['mean_batch_size']:.1f}, "
+              f"max {batcher['max_batch_size']}, queue delay p95 {batcher['queue_delay_ms_p95']:.1f} ms")
+    if report.get('reranker'):
+        reranker = report['reranker']
+        print(f"Reranking: {reranker['reranked']} reranked, {reranker['skipped']} skipped over budget, "
+              f"{reranker['pairs_scored']} pairs scored, {reranker['cache_hits']} cache hits")
+    print("=" * 70)
+    print(f"{'strategy':<12}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for kind, stats in report['strategies'].items():
+        print(f"{kind:<12}{stats['count']:>8}{stats['errors']:>8}{stats['p50_ms']:>10.1f}"
+              f"{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}{stats['max_ms']:>10.1f}")
+
+
+def check_slos(report, args):
+    """List of SLO violations (empty if all SLOs given on the command line hold)"""
+    overall = report['strategies'].get('all', {})
+    violations = []
+    if args.slo_p95_ms is not None and overall.get('p95_ms', 0.0) > args.slo_p95_ms:
+        violations.append(f"p95 {overall['p95_ms']:.1f} ms > {args.slo_p95_ms} ms")
+    if args.slo_p99_ms is not None and overall.get('p99_ms', 0.0) > args.slo_p99_ms:
+        violations.append(f"p99 {overall['p99_ms']:.1f} ms > {args.slo_p99_ms} ms")
+    if args.min_throughput is not None and report['throughput_rps'] < args.min_throughput:
+        violations.append(f"throughput {report['throughput_rps']:.1f} req/s < {args.min_throughput} req/s")
+    error_rate = report['errors'] / report['requests'] if report['requests'] else 0.0
+    if args.max_error_rate is not None and error_rate > args.max_error_rate:
+        violations.append(f"error rate {error_rate:.1%} > {args.max_error_rate:.1%}")
+    return violations
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target', choices=sorted(TARGETS), default='assistant')
+    parser.add_argument('--url', help="API server URL for --target http (or streamlit)")
+    parser.add_argument('--concurrency', type=int, default=10, help="Concurrent virtual users")
+    parser.add_argument('--rate', type=float, help="Open-loop arrival rate in questions/s")
+    parser.add_argument('--duration', type=float, help="Run for this many seconds instead of --requests")
+    parser.add_argument('--requests', type=int, default=500, help="Number of questions to send")
+    parser.add_argument('--warmup', type=int, default=20, help="Unmeasured questions sent first")
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help="Question mix, e.g. exact_code=0.4,department=0.2,topic=0.25,general=0.1,similar=0.05")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--courses', default='data/raw/ubc_courses.json')
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--batch-max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--batch-max-size', type=int, default=32)
+    parser.add_argument('--rerank', action='store_true', help="Rerank general questions (assistant target)")
+    parser.add_argument('--rerank-latency-ms', type=float, default=2.0, help="Simulated per-pair rerank cost")
+    parser.add_argument('--rerank-budget-ms', type=float, default=150.0)
+    parser.add_argument('--llm-latency-ms', type=float, default=0.0, help="Simulated fake-LLM latency")
+    parser.add_argument('--slo-p95-ms', type=float)
+    parser.add_argument('--slo-p99-ms', type=float)
+    parser.add_argument('--min-throughput', type=float)
+    parser.add_argument('--max-error-rate', type=float)
+    parser.add_argument('--json', help="Also write the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    if args.target == 'http' and not args.url:
+        parser.error("--target http needs --url")
+
+    with open(args.courses, 'r', encoding='utf-8') as f:
+        courses = json.load(f)
+
+    workdir = tempfile.mkdtemp(prefix='ubc-loadtest-')
+    try:
+        print(f"Setting up target '{args.target}'...")
+        new_session, assistant = TARGETS[args.target](args, courses, workdir)
+
+        questions = build_question_mix(courses, args.mix, max(args.requests, 1), args.seed)
+        if args.warmup:
+            print(f"Warming up with {args.warmup} questions...")
+            run_load(new_session, questions[:args.warmup], min(args.concurrency, args.warmup))
+
+        print(f"Running load: {args.concurrency} users...")
+        wall_start = time.monotonic()
+        cpu_start = sum(os.times()[:2])
+        results = run_load(new_session, questions, args.concurrency, args.duration, args.rate)
+        wall_time = time.monotonic() - wall_start
+        cpu_time = sum(os.times()[:2]) - cpu_start
+
+        report = summarize(
+            results, wall_time, cpu_time,
+            rss_mb=_rss_mb(),
+            peak_rss_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+        )
+        report['remote'] = args.target == 'http' or bool(args.url)
+        if assistant is not None:
+            report['batcher'] = assistant.batcher.stats()
+            if assistant.reranker is not None:
+                report['reranker'] = assistant.reranker.stats()
+            assistant.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(report, args)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    violations = check_slos(report, args)
+    for violation in violations:
+        print(f"✗ SLO violated: {violation}")
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
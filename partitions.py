@@ -0,0 +1,161 @@
+# partitions.py
+"""Campus/session partitioning of the course index and query routing.
+
+Courses are stored in one Chroma collection per (campus, year, session),
+e.g. "courses_ubcv_2024w". The router picks the partitions a question is
+about, from what the question says ("Okanagan", "summer 2025") or from the
+user's settings, so a search only touches the relevant slice of the catalog.
+"""
+import re
+
+# Phrases that pin a question to a campus
+CAMPUS_ALIASES = {
+    'UBCV': ['vancouver', 'ubcv', 'ubc-v', 'point grey'],
+    'UBCO': ['okanagan', 'ubco', 'ubc-o', 'kelowna'],
+}
+
+# UBC's Winter session runs September-April, Summer session May-August
+SESSION_ALIASES = {
+    'W': ['winter', 'fall', 'term 1', 'term 2'],
+    'S': ['summer'],
+}
+
+
+class Partition:
+    """One (campus, year, session) slice of the catalog and its collection"""
+
+    def __init__(self, campus, year, session, collection_name=None):
+        self.campus = campus
+        self.year = year
+        self.session = session
+        self.collection_name = collection_name or partition_collection_name(campus, year, session)
+
+    @property
+    def key(self):
+        return f"{self.campus}-{self.year}{self.session}"
+
+    @property
+    def order(self):
+        """Sort key, newest first when reversed (a year's W session follows its S)"""
+        return (self.year, self.session == 'W')
+
+    def record_id(self, code):
+        """Id of a course of this partition in partition-spanning tables"""
+        return f"{self.key}/{code}"
+
+    def to_dict(self):
+        return {
+            'campus': self.campus,
+            'year': self.year,
+            'session': self.session,
+            'collection': self.collection_name,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['campus'], data['year'], data['session'], data['collection'])
+
+    def __repr__(self):
+        return f"Partition({self.key})"
+
+
+class LegacyPartition(Partition):
+    """The single "courses" collection of an unpartitioned store"""
+
+    def __init__(self):
+        super().__init__(None, '', '', 'courses')
+
+    @property
+    def key(self):
+        return 'all'
+
+    def record_id(self, code):
+        return code
+
+
+def partition_collection_name(campus, year, session):
+    return f"courses_{campus}_{year}{session}".lower()
+
+
+def partition_of(course):
+    """(campus, year, session) of a course record"""
+    return (course['campus'], str(course['year']), course['session'])
+
+
+def split_by_partition(courses):
+    """Group course records into {Partition: [courses]}, newest partition first"""
+    groups = {}
+    for course in courses:
+        groups.setdefault(partition_of(course), []).append(course)
+    partitions = [Partition(*key) for key in groups]
+    partitions.sort(key=lambda p: p.order, reverse=True)
+    return {p: groups[(p.campus, p.year, p.session)] for p in partitions}
+
+
+class PartitionRouter:
+    """Chooses which partitions a question should be answered from"""
+
+    def __init__(self, partitions, default_campus=None):
+        self.partitions = sorted(partitions, key=lambda p: p.order, reverse=True)
+        self.default_campus = default_campus
+
+    def infer(self, question):
+        """Campus, year and session mentioned in the question (None if not mentioned)"""
+        text = question.lower()
+        campus = year = session = None
+        for code, aliases in CAMPUS_ALIASES.items():
+            if any(re.search(rf'\b{re.escape(alias)}\b', text) for alias in aliases):
+                campus = code
+                break
+
+        # "2024W", "2025 S" or a bare year
+        match = re.search(r'\b(20\d{2})\s*([ws])\b', text)
+        if match:
+            year, session = match.group(1), match.group(2).upper()
+        else:
+            match = re.search(r'\b(20\d{2})\b', text)
+            if match:
+                year = match.group(1)
+            for code, aliases in SESSION_ALIASES.items():
+                if any(re.search(rf'\b{re.escape(alias)}\b', text) for alias in aliases):
+                    session = code
+                    break
+        return campus, year, session
+
+    def _select(self, campus, year, session):
+        selected = [
+            p for p in self.partitions
+            if (campus is None or p.campus in (None, campus))
+            and (year is None or p.year in ('', year))
+            and (session is None or p.session in ('', session))
+        ]
+        if year is None and selected:
+            # Without an explicit year, only the most recent year of each campus
+            latest = {}
+            for p in selected:
+                latest.setdefault(p.campus, p.year)
+            selected = [p for p in selected if p.year == latest[p.campus]]
+        return selected
+
+    def route(self, question='', campus=None, year=None, session=None):
+        """Partitions to search, newest first.
+
+        What the question mentions wins over the user's settings (`campus`,
+        `year`, `session`), which win over the router's default campus.
+        Constraints that match nothing are relaxed rather than returning
+        no partitions at all.
+        """
+        asked_campus, asked_year, asked_session = self.infer(question)
+        campus = asked_campus or campus or self.default_campus
+        year = asked_year or year
+        session = asked_session or session
+        # Settings come from users and env vars: 'ubcv', 2024, 'w'
+        campus = campus.upper() if campus else None
+        year = str(year) if year else None
+        session = session.upper() if session else None
+
+        for constraints in ((campus, year, session), (campus, None, None), (None, None, None)):
+            selected = self._select(*constraints)
+            if selected:
+                return selected
+        return []
@@ -0,0 +1,108 @@
+# rerank.py
+"""Second-stage reranking of semantic search results with a cross-encoder.
+
+The bi-encoder search is cheap but coarse, and single-course answers trust
+its first hit. The reranker rescores only the top few candidates with a small
+CPU cross-encoder. Scores are memoized per (query, course), and each request
+gets a latency budget: when the estimated cost of the uncached pairs doesn't
+fit (the budget shrinks as more requests are in flight), fewer candidates are
+reranked, or none at all.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_RERANK_MODEL = 'cross-encoder/ms-marco-TinyBERT-L-2-v2'
+# Starting guess for the cost of scoring one pair, in ms
+INITIAL_MS_PER_PAIR = 5.0
+
+
+class CrossEncoderReranker:
+    """Reranks search candidates under a per-request latency budget"""
+
+    def __init__(self, model_name=DEFAULT_RERANK_MODEL, top_n=10, budget_ms=150.0,
+                 max_concurrency=4, cache_size=50000, model=None):
+        if model is None:
+            from sentence_transformers import CrossEncoder
+            model = CrossEncoder(model_name, max_length=256, device='cpu')
+        self.model = model
+        self.top_n = top_n
+        self.budget_ms = budget_ms
+        self.max_concurrency = max_concurrency
+        self.cache_size = cache_size
+
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        # Running estimate of the cost of scoring one pair, refined as we go
+        self._ms_per_pair = INITIAL_MS_PER_PAIR
+        self._warm = False
+        self._stats = {'requests': 0, 'reranked': 0, 'skipped': 0, 'pairs_scored': 0, 'cache_hits': 0}
+
+    @staticmethod
+    def _key(query, course):
+        return (' '.join(query.lower().split()), course['code'], hash(course['content']))
+
+    def _budget(self, inflight):
+        """Budget for this request; shrinks once requests exceed the CPU's parallelism"""
+        if inflight <= self.max_concurrency:
+            return self.budget_ms
+        return self.budget_ms * self.max_concurrency / inflight
+
+    def rerank(self, query, candidates, inflight=1):
+        """Return `candidates` with the top few reordered by cross-encoder score"""
+        head = candidates[:self.top_n]
+        keys = [self._key(query, course) for course in head]
+        with self._lock:
+            self._stats['requests'] += 1
+            scores = [self._cache.get(key) for key in keys]
+            for key, score in zip(keys, scores):
+                if score is not None:
+                    self._cache.move_to_end(key)
+            ms_per_pair = self._ms_per_pair
+
+        # Rerank the longest prefix whose uncached pairs fit in the budget
+        affordable = int(self._budget(inflight) / ms_per_pair)
+        n, uncached = 0, 0
+        for score in scores:
+            if score is None:
+                if uncached == affordable:
+                    break
+                uncached += 1
+            n += 1
+        if n < 2:
+            with self._lock:
+                self._stats['skipped'] += 1
+                # Nothing gets measured while skipping, so let one slow call
+                # (a contended moment) wear off instead of skipping forever
+                self._ms_per_pair = INITIAL_MS_PER_PAIR + 0.8 * (self._ms_per_pair - INITIAL_MS_PER_PAIR)
+            return candidates
+
+        missing = [i for i in range(n) if scores[i] is None]
+        if missing:
+            started = time.perf_counter()
+            predicted = self.model.predict([(query, head[i]['content']) for i in missing])
+            elapsed_ms = (time.perf_counter() - started) * 1000.0
+            for i, score in zip(missing, predicted):
+                scores[i] = float(score)
+
+        with self._lock:
+            if missing:
+                if self._warm:
+                    self._ms_per_pair = 0.8 * self._ms_per_pair + 0.2 * elapsed_ms / len(missing)
+                else:
+                    # The first call pays for loading and warming up the model
+                    self._warm = True
+                for i in missing:
+                    self._cache[keys[i]] = scores[i]
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            self._stats['reranked'] += 1
+            self._stats['pairs_scored'] += len(missing)
+            self._stats['cache_hits'] += n - len(missing)
+
+        order = sorted(range(n), key=lambda i: scores[i], reverse=True)
+        return [head[i] for i in order] + candidates[n:]
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, ms_per_pair=self._ms_per_pair, cached_pairs=len(self._cache))
@@ -4,6 +4,7 @@ import json
 import time
 import os
 import re
+from validation import validate_courses, print_report
 
 
 class UBCCourseScraper:
@@ -33,7 +34,8 @@ class UBCCourseScraper:
 
             # Use regex to find course codes and descriptions
             # Enhanced pattern matching for course codes
-            pattern = rf'{subject_code.upper()}_V\s*\d{{3}}(?:\s*\(\d+(?:\/\d+)?\))?\s*[A-Za-z]+'
+            # Credits can be fixed "(3)", split "(3/6)" or variable "(1-6)"
+            pattern = rf'{subject_code.upper()}_V\s*\d{{3}}(?:\s*\(\d+(?:[-\/]\d+)?\))?\s*[A-Za-z]+'
             course_matches = re.finditer(pattern, text_content)
 
             positions = [match.start() for match in course_matches]
@@ -47,6 +49,11 @@ class UBCCourseScraper:
                     # Get text from this course to the next (or end)
                     end_pos = positions[i + 1] if i + 1 < len(positions) else start_pos + 500
                     course_text = text_content[start_pos:end_pos].strip()
+                    if i + 1 == len(positions):
+                        # The last course has no next header to stop at; don't end mid-sentence
+                        cut = max(course_text.rfind('.'), course_text.rfind(']'))
+                        if cut > 0:
+                            course_text = course_text[:cut + 1]
 
                     # Extract course code (e.g., "CPSC_V 110")
                     course_code_match = re.match(rf'({subject_code.upper()}_V \d{{3}})', course_text)
@@ -59,7 +66,7 @@ class UBCCourseScraper:
                     # Look for pattern: (credits) Description
                     # Enhanced description extraction
                     desc_match = re.search(
-                        r'\(\d+(?:\/\d+)?\)\s*(.+?)(?=(?:Prerequisites?:|Corequisites?:|Pre-reqs?:|Co-reqs?:|Equivalency:|This course|Credits:|$))',
+                        r'\(\d+(?:[-\/]\d+)?\)\s*(.+?)(?=(?:Prerequisites?:|Corequisites?:|Pre-reqs?:|Co-reqs?:|Equivalency:|This course|Credits:|$))',
                         course_text, 
                         re.DOTALL | re.IGNORECASE
                     )
@@ -101,7 +108,11 @@ class UBCCourseScraper:
             return []
 
     def save_to_json(self, filename='data/raw/ubc_courses.json'):
-        """Save scraped data to JSON"""
+        """Validate, deduplicate and save scraped data to JSON"""
+        print("\n🔍 Validating scraped courses...")
+        self.courses, report = validate_courses(self.courses)
+        print_report(report)
+
         os.makedirs(os.path.dirname(filename), exist_ok=True)
         with open(filename, 'w', encoding='utf-8') as f:
             json.dump(self.courses, f, indent=2, ensure_ascii=False)
@@ -140,6 +151,9 @@ if __name__ == "__main__":
         'KIN', 'EDUC', 'LAW', 'MEDI', 'DENT', 'PHAR'
     ]
 
+    # Drop repeated subjects (GEOG and BIOL appear in two groups above)
+    subjects = list(dict.fromkeys(subjects))
+
     print(f"🚀 Starting to scrape {len(subjects)} subjects from UBC Calendar...")
     print("=" * 60)
 
@@ -0,0 +1,225 @@
+# server.py
+"""Async HTTP API in front of a single shared UBCCourseAssistant.
+
+Run locally with:
+    uvicorn server:app --workers 2 --port 8000
+
+Every uvicorn worker process loads its own assistant once at startup; all
+requests handled by that worker share it. Blocking embedding/search work runs
+in a bounded thread pool so the event loop stays responsive, and requests
+beyond the pool's queue capacity are rejected with 503 instead of piling up.
+"""
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Optional, Union
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+from chatbot import UBCCourseAssistant
+from conversation_memory import ConversationWindow
+
+
+class PoolFullError(Exception):
+    """Raised when the worker pool has no free slot or queue capacity"""
+
+
+class QueryPool:
+    """Bounded thread pool with admission control and per-call timeouts"""
+
+    def __init__(self, max_workers=32, max_queue=64, timeout=15.0):
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="assistant"
+        )
+        self.max_workers = max_workers
+        self.capacity = max_workers + max_queue
+        self.timeout = timeout
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, fn, *args):
+        """Run fn(*args) in the pool, or raise PoolFullError / asyncio.TimeoutError"""
+        with self._lock:
+            if self._pending >= self.capacity:
+                raise PoolFullError(f"{self._pending} requests already pending")
+            self._pending += 1
+
+        # The slot is released when the work actually finishes (or is
+        # cancelled before starting), not when the caller gives up waiting,
+        # so timed-out requests still count against the capacity.
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(self._release)
+        return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class AskRequest(BaseModel):
+    question: str
+    session_id: Optional[str] = None
+    # The user's catalog settings; a campus or term named in the question wins
+    campus: Optional[str] = None
+    year: Optional[Union[int, str]] = None
+    session: Optional[str] = None
+
+
+class SessionStore:
+    """LRU of per-session conversation windows, capped at max_sessions"""
+
+    def __init__(self, max_sessions=1000):
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+
+    def get(self, session_id):
+        if session_id is None:
+            # Anonymous requests get a throwaway window
+            return ConversationWindow()
+        window = self._sessions.pop(session_id, None) or ConversationWindow()
+        self._sessions[session_id] = window
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return window
+
+    def discard(self, session_id):
+        self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+state = {}
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Loading the model and Chroma client is slow; do it off the event loop
+    state["assistant"] = await asyncio.to_thread(UBCCourseAssistant.from_env)
+    state["pool"] = QueryPool(
+        max_workers=int(os.getenv("API_MAX_WORKERS", "32")),
+        max_queue=int(os.getenv("API_MAX_QUEUE", "64")),
+        timeout=float(os.getenv("API_TIMEOUT", "15")),
+    )
+    state["sessions"] = SessionStore(max_sessions=int(os.getenv("API_MAX_SESSIONS", "1000")))
+    yield
+    state["pool"].shutdown()
+    state["assistant"].close()
+    state.clear()
+
+
+app = FastAPI(title="UBC Course Assistant", lifespan=lifespan)
+
+
+async def _run(fn, *args):
+    """Run blocking assistant work in the pool, mapping overload to HTTP errors"""
+    try:
+        return await state["pool"].run(fn, *args)
+    except PoolFullError:
+        raise HTTPException(status_code=503, detail="Server busy, try again shortly")
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Query timed out")
+
+
+@app.get("/health")
+async def health():
+    pool = state.get("pool")
+    return {
+        "status": "ok" if pool else "starting",
+        "pending": pool.pending if pool else 0,
+        "capacity": pool.capacity if pool else 0,
+        "sessions": len(state["sessions"]) if pool else 0,
+        "index_version": state["assistant"].version if pool else None,
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    assistant = state["assistant"]
+    return {
+        "batcher": assistant.batcher.stats(),
+        "reranker": assistant.reranker.stats() if assistant.reranker else None,
+    }
+
+
+@app.post("/ask")
+async def ask(request: AskRequest):
+    if not request.question.strip():
+        raise HTTPException(status_code=400, detail="Question must not be empty")
+    conversation = state["sessions"].get(request.session_id)
+    return await _run(
+        state["assistant"].ask,
+        request.question,
+        conversation,
+        request.campus,
+        request.year,
+        request.session,
+    )
+
+
+@app.delete("/session/{session_id}")
+async def reset_session(session_id: str):
+    state["sessions"].discard(session_id)
+    return {"session_id": session_id, "reset": True}
+
+
+@app.get("/course/{code}")
+async def course(code: str):
+    result = await _run(state["assistant"].get_course, code)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Course {code} not found")
+    return result
+
+
+@app.get("/suggest")
+async def suggest(q: str, limit: int = 8):
+    # Prefix index lookups take microseconds, no need for the pool
+    return {"query": q, "suggestions": state["assistant"].suggest(q, max(1, min(limit, 25)))}
+
+
+@app.get("/similar/{code}")
+async def similar(code: str, k: int = 5, same_dept: bool = False):
+    # Table lookup, cheap enough to answer on the event loop
+    results = state["assistant"].similar_courses(code, max(1, min(k, 20)), same_dept)
+    if not results:
+        raise HTTPException(status_code=404, detail=f"No similar courses for {code}")
+    return {"course": code, "similar": results}
+
+
+@app.get("/department/{dept}")
+async def department(dept: str):
+    courses = await _run(state["assistant"].get_department_courses, dept)
+    if not courses:
+        raise HTTPException(status_code=404, detail=f"Department {dept} not found")
+    return {"department": dept.upper(), "courses": courses}
+
+
+@app.get("/search")
+async def search(q: str, k: int = 10):
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Query must not be empty")
+    k = max(1, min(k, 50))
+    return {"query": q, "results": await _run(state["assistant"].search, q, k)}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(
+        "server:app",
+        host=os.getenv("API_HOST", "127.0.0.1"),
+        port=int(os.getenv("API_PORT", "8000")),
+        workers=int(os.getenv("API_WORKERS", "1")),
+    )
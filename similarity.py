@@ -0,0 +1,227 @@
+# similarity.py
+"""Precomputed course-to-course similarity graph.
+
+Each course's top-k nearest neighbours (cosine similarity of the stored
+embeddings) are computed offline with blocked matrix multiplication and
+saved as a compact .npz table, so "courses like X" queries become a table
+lookup instead of a fresh embedding and vector search.
+"""
+import os
+
+import numpy as np
+
+DEFAULT_K = 20
+BLOCK_SIZE = 512
+
+# Above this fraction of changed courses an incremental update costs about as
+# much as a full rebuild, so just rebuild
+MAX_INCREMENTAL_FRACTION = 0.25
+
+
+def _normalize_rows(embeddings):
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _top_k(sims, k):
+    """Indices and scores of the k largest values in each row, best first"""
+    k = min(k, sims.shape[1])
+    if k <= 0:
+        return np.empty((sims.shape[0], 0), dtype=np.int32), np.empty((sims.shape[0], 0), dtype=np.float32)
+    idx = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+    part = np.take_along_axis(sims, idx, axis=1)
+    order = np.argsort(-part, axis=1)
+    return np.take_along_axis(idx, order, axis=1).astype(np.int32), np.take_along_axis(part, order, axis=1)
+
+
+def _pad(idx, scores, k):
+    """Pad neighbour lists narrower than k with -1 / -inf"""
+    missing = k - idx.shape[1]
+    if missing > 0:
+        idx = np.pad(idx, ((0, 0), (0, missing)), constant_values=-1)
+        scores = np.pad(scores, ((0, 0), (0, missing)), constant_values=-np.inf)
+    return idx, scores
+
+
+def compute_neighbors(vectors, rows, k, candidates=None, block_size=BLOCK_SIZE):
+    """Top-k neighbours of vectors[rows] among vectors[candidates] (all by default).
+
+    `vectors` must be L2-normalized. A row is never its own neighbour.
+    Returns (neighbors, scores) with neighbours as indices into `vectors`.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    candidates = np.arange(len(vectors)) if candidates is None else np.asarray(candidates, dtype=np.int64)
+    neighbors = np.full((len(rows), k), -1, dtype=np.int32)
+    scores = np.full((len(rows), k), -np.inf, dtype=np.float32)
+    if len(candidates) == 0:
+        return neighbors, scores
+
+    candidate_vectors = vectors[candidates]
+    for start in range(0, len(rows), block_size):
+        block = rows[start:start + block_size]
+        sims = vectors[block] @ candidate_vectors.T
+        # Mask self-similarity
+        self_hits = block[:, None] == candidates[None, :]
+        sims[self_hits] = -np.inf
+        idx, top = _top_k(sims, k)
+        idx, top = _pad(candidates[idx].astype(np.int32), top, k)
+        neighbors[start:start + len(block)] = idx
+        scores[start:start + len(block)] = top
+
+    # Slots that only held a masked self-match are not real neighbours
+    neighbors[~np.isfinite(scores)] = -1
+    return neighbors, scores
+
+
+class SimilarityTable:
+    """Top-k neighbour lists for every course, overall and within its department"""
+
+    def __init__(self, codes, departments, hashes, neighbors, scores, dept_neighbors, dept_scores):
+        self.codes = list(codes)
+        self.departments = list(departments)
+        self.hashes = list(hashes)
+        self.neighbors = neighbors
+        self.scores = scores
+        self.dept_neighbors = dept_neighbors
+        self.dept_scores = dept_scores
+        self.row_of = {code: i for i, code in enumerate(self.codes)}
+
+    @property
+    def k(self):
+        return self.neighbors.shape[1]
+
+    def similar(self, code, k=5, same_dept=False):
+        """[(code, score), ...] for the k most similar courses to `code`"""
+        row = self.row_of.get(code)
+        if row is None:
+            return []
+        neighbors = self.dept_neighbors if same_dept else self.neighbors
+        scores = self.dept_scores if same_dept else self.scores
+        return [
+            (self.codes[j], float(score))
+            for j, score in zip(neighbors[row, :k], scores[row, :k])
+            if j >= 0
+        ]
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.tmp.npz'
+        np.savez_compressed(
+            tmp_path,
+            codes=np.array(self.codes),
+            departments=np.array(self.departments),
+            hashes=np.array(self.hashes),
+            neighbors=self.neighbors,
+            scores=self.scores.astype(np.float16),
+            dept_neighbors=self.dept_neighbors,
+            dept_scores=self.dept_scores.astype(np.float16),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(
+                codes=data['codes'].tolist(),
+                departments=data['departments'].tolist(),
+                hashes=data['hashes'].tolist(),
+                neighbors=data['neighbors'],
+                scores=data['scores'].astype(np.float32),
+                dept_neighbors=data['dept_neighbors'],
+                dept_scores=data['dept_scores'].astype(np.float32),
+            )
+
+
+def _department_neighbors(vectors, departments, k):
+    """Neighbours restricted to each course's own department"""
+    neighbors = np.full((len(vectors), k), -1, dtype=np.int32)
+    scores = np.full((len(vectors), k), -np.inf, dtype=np.float32)
+    by_dept = {}
+    for i, dept in enumerate(departments):
+        by_dept.setdefault(dept, []).append(i)
+    for rows in by_dept.values():
+        dept_idx, dept_scores = compute_neighbors(vectors, rows, k, candidates=rows)
+        neighbors[rows] = dept_idx
+        scores[rows] = dept_scores
+    return neighbors, scores
+
+
+def build_similarity_table(codes, departments, embeddings, hashes, k=DEFAULT_K):
+    """Compute the full neighbour table from scratch"""
+    vectors = _normalize_rows(embeddings)
+    neighbors, scores = compute_neighbors(vectors, np.arange(len(vectors)), k)
+    dept_neighbors, dept_scores = _department_neighbors(vectors, departments, k)
+    return SimilarityTable(codes, departments, hashes, neighbors, scores, dept_neighbors, dept_scores)
+
+
+def update_similarity_table(old, codes, departments, embeddings, hashes, k=DEFAULT_K):
+    """Refresh `old` for the current catalog, recomputing only what changed.
+
+    Rows of new/changed courses, and rows whose neighbour list pointed at a
+    changed or removed course, are recomputed against the whole catalog.
+    Every other row keeps its neighbours and only merges in its similarity
+    to the changed courses. Department lists are always rebuilt (cheap).
+    """
+    n = len(codes)
+    if old is None or old.k < k or n == 0:
+        return build_similarity_table(codes, departments, embeddings, hashes, k)
+
+    old_hash = dict(zip(old.codes, old.hashes))
+    changed = np.array([i for i, code in enumerate(codes) if old_hash.get(code) != hashes[i]], dtype=np.int64)
+    removed = set(old.codes) - set(codes)
+    if len(changed) == 0 and not removed:
+        return old
+    if len(changed) + len(removed) > MAX_INCREMENTAL_FRACTION * n:
+        return build_similarity_table(codes, departments, embeddings, hashes, k)
+
+    vectors = _normalize_rows(embeddings)
+    new_row = {code: i for i, code in enumerate(codes)}
+    changed_codes = {codes[i] for i in changed}
+    dirty_codes = changed_codes | removed
+
+    neighbors = np.full((n, k), -1, dtype=np.int32)
+    scores = np.full((n, k), -np.inf, dtype=np.float32)
+    stale = set(changed.tolist())
+    keep = []
+    for i, code in enumerate(codes):
+        if i in stale:
+            continue
+        old_row = old.row_of[code]
+        old_codes = [old.codes[j] for j in old.neighbors[old_row, :k] if j >= 0]
+        if dirty_codes.intersection(old_codes):
+            stale.add(i)
+            continue
+        neighbors[i, :len(old_codes)] = [new_row[c] for c in old_codes]
+        scores[i, :len(old_codes)] = old.scores[old_row, :len(old_codes)]
+        keep.append(i)
+
+    stale = np.array(sorted(stale), dtype=np.int64)
+    if len(stale):
+        neighbors[stale], scores[stale] = compute_neighbors(vectors, stale, k)
+
+    if keep and len(changed):
+        keep = np.array(keep, dtype=np.int64)
+        new_idx, new_scores = compute_neighbors(vectors, keep, k, candidates=changed)
+        merged_idx = np.concatenate([neighbors[keep], new_idx], axis=1)
+        merged_scores = np.concatenate([scores[keep], new_scores], axis=1)
+        top_idx, top_scores = _top_k(merged_scores, k)
+        neighbors[keep] = np.take_along_axis(merged_idx, top_idx, axis=1)
+        scores[keep] = top_scores
+        neighbors[~np.isfinite(scores)] = -1
+
+    print(f"Similarity table: recomputed {len(stale)} rows, merged {len(keep)} rows")
+    dept_neighbors, dept_scores = _department_neighbors(vectors, departments, k)
+    return SimilarityTable(codes, departments, hashes, neighbors, scores, dept_neighbors, dept_scores)
+
+
+def load_similarity_table(path):
+    """Load a saved table, or None if there isn't one"""
+    if not os.path.exists(path):
+        return None
+    try:
+        return SimilarityTable.load(path)
+    except Exception as e:
+        print(f"Warning: Could not load similarity table: {e}")
+        return None
@@ -0,0 +1,151 @@
+# snapshots.py
+"""Versioned index snapshots.
+
+Each run of create_vectordb.py writes a new, self-contained snapshot
+directory and then publishes it by atomically rewriting the CURRENT pointer:
+
+    snapshots/
+        CURRENT                 name of the live version
+        v20241019-120000/
+            manifest.json       written last; a snapshot without it is incomplete
+            courses.json        validated catalog
+            embeddings.npy      one row per course, same order as courses.json
+            similarity.npz      precomputed neighbour table
+            chroma/             Chroma store
+            leases/             one file per process still serving this version
+
+Running assistants poll CURRENT and hot-swap to new versions. Pruning old
+versions skips any that a live process holds a lease on. Liveness can only be
+checked for processes on this host; leases from other hosts sharing the
+directory count as live until their owner releases them (or they are deleted
+by hand), so a crashed remote server can keep old versions on disk.
+"""
+import json
+import os
+import shutil
+import socket
+import time
+import uuid
+
+SNAPSHOT_ROOT = './snapshots'
+EMBEDDING_MODEL = 'paraphrase-MiniLM-L3-v2'
+
+CURRENT_FILE = 'CURRENT'
+MANIFEST_FILE = 'manifest.json'
+COURSES_FILE = 'courses.json'
+EMBEDDINGS_FILE = 'embeddings.npy'
+SIMILARITY_FILE = 'similarity.npz'
+CHROMA_DIR = 'chroma'
+LEASES_DIR = 'leases'
+
+# Published snapshots kept on disk (older ones may still serve in-flight requests)
+KEEP_SNAPSHOTS = 3
+
+
+def current_version(root=SNAPSHOT_ROOT):
+    """Name of the published snapshot, or None if nothing is published yet"""
+    try:
+        with open(os.path.join(root, CURRENT_FILE), 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def snapshot_path(root, version):
+    return os.path.join(root, version)
+
+
+def read_manifest(path):
+    with open(os.path.join(path, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def begin_snapshot(root=SNAPSHOT_ROOT):
+    """Create an empty directory for a new snapshot, returning (version, path)"""
+    os.makedirs(root, exist_ok=True)
+    base = time.strftime('v%Y%m%d-%H%M%S')
+    version, n = base, 1
+    while os.path.exists(snapshot_path(root, version)):
+        n += 1
+        version = f"{base}-{n}"
+    path = snapshot_path(root, version)
+    os.makedirs(path)
+    return version, path
+
+
+def _write_atomic(path, text):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def publish_snapshot(root, version, manifest):
+    """Write the manifest, then atomically point CURRENT at the new version"""
+    path = snapshot_path(root, version)
+    _write_atomic(os.path.join(path, MANIFEST_FILE), json.dumps(manifest, indent=2))
+    _write_atomic(os.path.join(root, CURRENT_FILE), version + '\n')
+    prune_snapshots(root)
+
+
+def acquire_lease(path):
+    """Mark a snapshot as in use by this process; returns the lease file to release"""
+    leases = os.path.join(path, LEASES_DIR)
+    os.makedirs(leases, exist_ok=True)
+    lease = os.path.join(leases, f"{socket.gethostname()}.{os.getpid()}.{uuid.uuid4().hex[:8]}")
+    with open(lease, 'w', encoding='utf-8'):
+        pass
+    return lease
+
+
+def release_lease(lease):
+    try:
+        os.remove(lease)
+    except FileNotFoundError:
+        pass
+
+
+def _pid_alive(pid):
+    if os.name == 'nt':
+        # os.kill can't probe a process on Windows; assume it is alive
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def in_use(path):
+    """Whether a live process holds a lease on the snapshot; stale local leases are removed"""
+    try:
+        leases = os.listdir(os.path.join(path, LEASES_DIR))
+    except FileNotFoundError:
+        return False
+    hostname = socket.gethostname()
+    live = False
+    for name in leases:
+        # <hostname>.<pid>.<token>; hostnames may contain dots
+        host, pid, _ = (name.rsplit('.', 2) + ['', ''])[:3]
+        if host != hostname or not pid.isdigit() or _pid_alive(int(pid)):
+            live = True
+        else:
+            release_lease(os.path.join(path, LEASES_DIR, name))
+    return live
+
+
+def prune_snapshots(root=SNAPSHOT_ROOT, keep=KEEP_SNAPSHOTS):
+    """Delete all but the newest `keep` snapshots, never the current one or one still in use"""
+    current = current_version(root)
+    versions = sorted(
+        name for name in os.listdir(root)
+        if name.startswith('v') and os.path.isdir(snapshot_path(root, name))
+    )
+    for version in versions[:-keep]:
+        path = snapshot_path(root, version)
+        if version != current and not in_use(path):
+            shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,114 @@
+# typeahead.py
+"""Prefix index over course codes and titles for typeahead suggestions.
+
+Keys are kept in one sorted list and looked up with bisect, so a suggestion
+is a binary search plus a short scan rather than a trip through `ask`.
+"""
+import re
+from bisect import bisect_left
+
+# Lowercase words allowed inside a title ("Introduction to Engineering")
+TITLE_MINOR_WORDS = {'a', 'an', 'and', 'as', 'at', 'for', 'from', 'in', 'of', 'on', 'or', 'the', 'to', 'with', '&', '-'}
+MAX_TITLE_WORDS = 10
+
+# Keys scanned per lookup; keeps very short prefixes ("s") sub-millisecond
+MAX_SCAN = 500
+
+
+def normalize_query(text):
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return ' '.join(re.sub(r'[^a-z0-9&]+', ' ', text.lower()).split())
+
+
+def extract_title(description):
+    """Leading title words of a calendar description.
+
+    Descriptions start with the title followed by the first sentence, e.g.
+    "Introduction to Engineering I An introduction to the engineering ...".
+    The title is the run of capitalized/minor words; its last capitalized
+    word (plus any minor words after it) is dropped when it is really the
+    start of the following sentence.
+    """
+    words = description.split()
+    title = []
+    sentence_found = False
+    for word in words[:MAX_TITLE_WORDS + 1]:
+        if word[0].isupper() or word[0].isdigit() or word.lower() in TITLE_MINOR_WORDS:
+            title.append(word)
+        else:
+            sentence_found = True
+            break
+    if sentence_found and len(title) > 1:
+        # "... Overview of" -> drop lowercase minor words, then the capitalized start
+        while len(title) > 2 and title[-1] in TITLE_MINOR_WORDS:
+            title.pop()
+        title.pop()
+    while len(title) > 1 and title[-1] in TITLE_MINOR_WORDS:
+        title.pop()
+    return ' '.join(title[:MAX_TITLE_WORDS]).rstrip(',:;')
+
+
+class PrefixIndex:
+    """Sorted-array prefix index over course codes and title words"""
+
+    # Rank of each kind of match, lower is better
+    CODE, TITLE_START, TITLE_WORD = 0, 1, 2
+
+    def __init__(self, courses):
+        self.entries = []
+        entries = []
+        for course in courses:
+            code = course['course_code']
+            title = extract_title(course.get('description', ''))
+            self.entries.append({'code': code, 'title': title})
+            i = len(self.entries) - 1
+
+            norm_code = normalize_query(code)
+            entries.append((norm_code, self.CODE, i))
+            entries.append((norm_code.replace(' ', ''), self.CODE, i))
+
+            # Every suffix of the title, so "stat" finds "Applied Statistics"
+            title_words = normalize_query(title).split()
+            for start, word in enumerate(title_words):
+                if word in TITLE_MINOR_WORDS:
+                    continue
+                rank = self.TITLE_START if start == 0 else self.TITLE_WORD
+                entries.append((' '.join(title_words[start:]), rank, i))
+
+        entries.sort()
+        self.keys = [key for key, _, _ in entries]
+        self.values = [(rank, i) for _, rank, i in entries]
+
+    def suggest(self, prefix, limit=8):
+        """Courses whose code or title words start with `prefix`.
+
+        Multi-word prefixes match word by word, so "intro to stat" finds
+        "Introduction to Statistics".
+        """
+        query = normalize_query(prefix)
+        if not query:
+            return []
+        tokens = query.split()
+
+        best = {}
+        start = bisect_left(self.keys, tokens[0])
+        for pos in range(start, min(start + MAX_SCAN, len(self.keys))):
+            key = self.keys[pos]
+            if not key.startswith(tokens[0]):
+                break
+            rank, i = self.values[pos]
+            if len(tokens) > 1 and not self._matches_words(key, tokens, rank):
+                continue
+            if i not in best or rank < best[i]:
+                best[i] = rank
+
+        ranked = sorted(best.items(), key=lambda item: (item[1], self.entries[item[0]]['code']))
+        return [self.entries[i] for i, _ in ranked[:limit]]
+
+    def _matches_words(self, key, tokens, rank):
+        if rank == self.CODE:
+            return key.startswith(' '.join(tokens))
+        words = key.split()
+        if len(words) < len(tokens):
+            return False
+        return all(word.startswith(token) for word, token in zip(words, tokens))
@@ -0,0 +1,137 @@
+# validation.py
+"""Validation and deduplication of scraped course records.
+
+Runs between the scraper and the vector DB so the same course is never
+embedded or stored twice. Records are deduplicated by normalized course code
+(keeping the best-quality copy) and by content hash, and malformed records
+are repaired where possible, flagged, or dropped.
+"""
+import hashlib
+import re
+from collections import Counter
+
+REQUIRED_FIELDS = ('department', 'course_code', 'description')
+MIN_DESCRIPTION_LENGTH = 20
+
+# Another course's header leaking into a description, e.g. "... GEOG_V 514 (1-6) Topics".
+# Only a code followed by a credit group and a title counts; in-text
+# references like "Credit will be granted for only one of COMM_V 190" stay.
+MERGED_SLICE_PATTERN = re.compile(r'\s*\b[A-Z]{2,4}_V\s*\d{3}\s*\(\d+(?:[-/]\d+)?\)\s*[A-Z].*$', re.DOTALL)
+SENTENCE_END_PATTERN = re.compile(r'[.!?\])"\']\s*$')
+
+# Issues that make a record unusable; anything else is only a warning
+FATAL_ISSUES = {'missing_field', 'empty_description', 'bad_course_code'}
+
+
+def normalize_course_code(code):
+    """Normalize 'cpsc110' / 'CPSC-110' / 'CPSC_V  110' to 'CPSC 110'"""
+    match = re.match(r'^\s*([A-Za-z]{2,4})(?:_V)?\s*[-_]?\s*(\d{3}[A-Za-z]?)\s*$', code)
+    if match:
+        return f"{match.group(1).upper()} {match.group(2).upper()}"
+    return ' '.join(code.upper().split())
+
+
+def content_hash(course):
+    """Stable hash of a course's code, offering and text, insensitive to whitespace and case"""
+    parts = [
+        normalize_course_code(course.get('course_code', '')),
+        course.get('campus', ''),
+        str(course.get('year', '')),
+        course.get('session', ''),
+        course.get('description', ''),
+        course.get('prerequisites', ''),
+    ]
+    text = '\x1f'.join(' '.join(part.lower().split()) for part in parts)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def check_course(course):
+    """Return a cleaned copy of the record and the list of issues found"""
+    issues = []
+    if any(not course.get(field) for field in REQUIRED_FIELDS):
+        issues.append('missing_field')
+
+    cleaned = dict(course)
+    cleaned['course_code'] = normalize_course_code(course.get('course_code', ''))
+    if not re.match(r'^[A-Z]{2,4} \d{3}[A-Z]?$', cleaned['course_code']):
+        issues.append('bad_course_code')
+
+    description = ' '.join(course.get('description', '').split())
+    repaired = MERGED_SLICE_PATTERN.sub('', description).strip()
+    if repaired != description:
+        issues.append('merged_slice')
+        description = repaired
+    cleaned['description'] = description
+
+    if not description:
+        issues.append('empty_description')
+    elif len(description) < MIN_DESCRIPTION_LENGTH or not SENTENCE_END_PATTERN.search(description):
+        # A bare title ("Honours Essay") or a slice cut mid-sentence; still a real course
+        issues.append('title_only' if len(description.split()) <= 10 else 'truncated')
+
+    return cleaned, issues
+
+
+def _quality(course, issues):
+    """Sort key for picking the best of several records with the same code"""
+    return (not issues, -len(issues), len(course.get('description', '')))
+
+
+def validate_courses(courses):
+    """Deduplicate and validate course records.
+
+    Returns (clean_courses, report). Clean courses keep the input order of
+    the first occurrence of each course code per campus/year/session; report
+    holds counts of what was dropped, repaired and flagged.
+    """
+    report = {
+        'input': len(courses),
+        'kept': 0,
+        'duplicate_content': 0,
+        'duplicate_code': 0,
+        'dropped_malformed': 0,
+        'issues': Counter(),
+    }
+
+    seen_hashes = set()
+    best = {}
+    for course in courses:
+        digest = content_hash(course)
+        if digest in seen_hashes:
+            report['duplicate_content'] += 1
+            continue
+        seen_hashes.add(digest)
+
+        cleaned, issues = check_course(course)
+        if FATAL_ISSUES.intersection(issues):
+            report['dropped_malformed'] += 1
+            report['issues'].update(issues)
+            continue
+
+        # The same course offered in another campus/session is a separate record
+        key = (cleaned.get('campus'), str(cleaned.get('year')), cleaned.get('session'), cleaned['course_code'])
+        if key in best:
+            report['duplicate_code'] += 1
+            if _quality(cleaned, issues) <= _quality(*best[key]):
+                continue
+        best[key] = (cleaned, issues)
+
+    clean = []
+    for cleaned, issues in best.values():
+        report['issues'].update(issues)
+        cleaned['content_hash'] = content_hash(cleaned)
+        clean.append(cleaned)
+
+    report['kept'] = len(clean)
+    return clean, report
+
+
+def print_report(report):
+    """Print a short summary of a validate_courses report"""
+    print(f"  Input records:       {report['input']}")
+    print(f"  Exact duplicates:    {report['duplicate_content']}")
+    print(f"  Duplicate codes:     {report['duplicate_code']}")
+    print(f"  Dropped (malformed): {report['dropped_malformed']}")
+    for issue, count in sorted(report['issues'].items()):
+        print(f"    {issue}: {count}")
+    print(f"  Kept:                {report['kept']}")